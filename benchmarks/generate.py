@@ -0,0 +1,124 @@
+import json
+from os import makedirs
+from os.path import join
+from typing import Any
+
+from lxml import etree as et
+
+CONTENT_TYPES = ("json", "xml", "txt")
+
+# Shape -> default size, i.e. nesting depth of deep and number of items of huge
+SHAPES = {"small": 0, "deep": 32, "huge": 10000}
+
+# The value of the group of each candidate, and of the matching request
+GROUP = "(.*)"
+VALUE = "bench"
+
+# The namespace and attributes of the xml root element
+NAMESPACE = "urn:rsimulator:bench"
+ATTRIBUTES = {"type": "bench", "version": "1.0"}
+
+
+def __structure(shape: str, index: int, size: int, value: str) -> dict[str, Any]:
+    structure = {"id": str(index), "name": value}
+    if shape == "deep":
+        for depth in range(size):
+            structure = {f"level{depth}": structure}
+    elif shape == "huge":
+        items = {f"item{i}": f"value{i}" for i in range(size)}
+        structure = {"id": str(index), "items": items, "name": value}
+    return structure
+
+
+def __reversed(structure: dict[str, Any]) -> dict[str, Any]:
+    return {
+        key: __reversed(value) if isinstance(value, dict) else value
+        for key, value in reversed(structure.items())
+    }
+
+
+def __xml(structure: dict[str, Any], element: et.Element) -> et.Element:
+    for key, value in structure.items():
+        child = et.SubElement(element, f"{{{NAMESPACE}}}{key}")
+        if isinstance(value, dict):
+            __xml(value, child)
+        else:
+            child.text = value
+    return element
+
+
+def __txt(structure: dict[str, Any], prefix: str = "") -> list[str]:
+    lines = []
+    for key, value in structure.items():
+        if isinstance(value, dict):
+            lines.extend(__txt(value, f"{prefix}{key}."))
+        else:
+            lines.append(f"{prefix}{key}={value}")
+    return lines
+
+
+def __render(content_type: str, structure: dict[str, Any], request: bool) -> str:
+    # Requests are rendered as clients could, i.e. not as the candidates, so that
+    # they are not matched by the candidates as plain regex but as documents
+    if content_type == "json":
+        return (
+            json.dumps(__reversed(structure), indent=2)
+            if request
+            else json.dumps(structure)
+        )
+    if content_type == "xml":
+        attributes = dict(reversed(ATTRIBUTES.items())) if request else ATTRIBUTES
+        root = et.Element(
+            f"{{{NAMESPACE}}}root",
+            attributes,
+            nsmap={None if request else "b": NAMESPACE},
+        )
+        return et.tostring(
+            __xml(structure, root),
+            pretty_print=request,
+            xml_declaration=request,
+            encoding="utf-8",
+        ).decode("utf-8")
+    # The txt matcher only strips the request
+    return "\n".join(__txt(structure)) + ("\n" if request else "")
+
+
+def payload(
+    content_type: str, shape: str, index: int = 0, size: int | None = None
+) -> tuple[str, str]:
+    """
+    Returns a candidate of content_type and shape, with one group, and a request that
+    matches it, rendered differently, e.g. with another key order or indentation.
+    Candidates with different index do not match each other's requests.
+    """
+    size = SHAPES[shape] if size is None else size
+    return (
+        __render(content_type, __structure(shape, index, size, GROUP), False),
+        __render(content_type, __structure(shape, index, size, VALUE), True),
+    )
+
+
+def tree(
+    root_path: str,
+    content_type: str,
+    shape: str,
+    count: int,
+    size: int | None = None,
+) -> tuple[str, str]:
+    """
+    Writes count candidates and responses to <root_path>/<root_relative_path>, at most
+    1000 per directory. Returns the root_relative_path and a request that matches the
+    last candidate, in path order.
+    """
+    root_relative_path = f"{content_type}/{shape}/{count}"
+    for index in range(count):
+        directory = join(root_path, root_relative_path, f"{index // 1000:03d}")
+        if index % 1000 == 0:
+            makedirs(directory, exist_ok=True)
+        candidate, _ = payload(content_type, shape, index, size)
+        name = f"{index:06d}"
+        with open(join(directory, f"{name}_Request.{content_type}"), "wt") as f:
+            f.write(candidate)
+        with open(join(directory, f"{name}_Response.{content_type}"), "wt") as f:
+            f.write(__render(content_type, {"response": "${1}"}, False))
+    return root_relative_path, payload(content_type, shape, count - 1, size)[1]
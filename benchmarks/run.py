@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+
+import rsimulator_core.config as config
+import rsimulator_core.regex.config as regex_config
+import rsimulator_http.config as http_config
+from benchmarks.generate import CONTENT_TYPES, SHAPES, payload, tree
+from rsimulator_core import core
+from rsimulator_core.regex import find_matches, json_matcher, txt_matcher, xml_matcher
+from rsimulator_http import asgi
+from rsimulator_http.http import app
+
+__matchers = {"json": json_matcher, "xml": xml_matcher, "txt": txt_matcher}
+
+__mime_types = {
+    "json": "application/json",
+    "xml": "application/xml",
+    "txt": "text/plain",
+}
+
+
+def measure(f: Callable[[], Any], duration: float, iterations: int) -> dict[str, Any]:
+    """
+    Calls f at least iterations times and for at least duration seconds, after one
+    warm up call. Returns the throughput, in calls per second, and the latency
+    percentiles, in seconds.
+    """
+    f()
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < iterations or time.perf_counter() - start < duration:
+        call_start = time.perf_counter()
+        f()
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    percentiles = (
+        statistics.quantiles(latencies, n=100, method="inclusive")
+        if len(latencies) > 1
+        else latencies * 99
+    )
+    return {
+        "iterations": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "latency": {
+            "mean": statistics.fmean(latencies),
+            "min": min(latencies),
+            "p50": percentiles[49],
+            "p90": percentiles[89],
+            "p99": percentiles[98],
+            "max": max(latencies),
+        },
+    }
+
+
+def __asgi_call(path: str, request: bytes, mime_type: str) -> Callable[[], Any]:
+    loop = asyncio.new_event_loop()
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"content-type", mime_type.encode())],
+    }
+
+    async def call() -> None:
+        async def receive() -> dict[str, Any]:
+            return {"type": "http.request", "body": request, "more_body": False}
+
+        async def send(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                assert message["status"] == 200, message
+
+        await asgi.app(scope, receive, send)
+
+    return lambda: loop.run_until_complete(call())
+
+
+def __flask_call(path: str, request: bytes, mime_type: str) -> Callable[[], Any]:
+    client = app.test_client()
+
+    def call() -> None:
+        response = client.post(path, data=request, content_type=mime_type)
+        assert response.status_code == 200, response.status
+
+    return call
+
+
+def __benchmarks(
+    root_path: str, content_type: str, shape: str, args: argparse.Namespace
+) -> list[tuple[dict[str, Any], Callable[[], Any]]]:
+    matcher = __matchers[content_type]
+    size = {"deep": args.depth, "huge": args.items}.get(shape, 0)
+    candidate, request = payload(content_type, shape, size=size)
+    prepared = matcher.prepare(candidate)
+    benchmarks = [
+        (
+            {"name": f"{content_type}_matcher.match"},
+            lambda r=request: matcher.match(prepared, r),
+        )
+    ]
+    for count in args.candidates:
+        print(f"Generating {count} {shape} {content_type} candidates", file=sys.stderr)
+        path, request = tree(root_path, content_type, shape, count, size)
+        request_bytes = request.encode("utf-8")
+        mime_type = __mime_types[content_type]
+        params = {"candidates": count}
+        benchmarks += [
+            (
+                {"name": "matcher.find_matches"} | params,
+                lambda p=path, r=request: find_matches(root_path, p, r, content_type),
+            ),
+            (
+                {"name": "core.service"} | params,
+                lambda p=path, r=request: core.service(root_path, p, r, content_type),
+            ),
+            (
+                {"name": "http.app"} | params,
+                __flask_call(f"/{path}", request_bytes, mime_type),
+            ),
+            (
+                {"name": "asgi.app"} | params,
+                __asgi_call(f"/{path}", request_bytes, mime_type),
+            ),
+        ]
+    return benchmarks
+
+
+def run(args: argparse.Namespace) -> dict[str, Any]:
+    config.CACHE = args.cache
+    regex_config.CHECK_INTERVAL = args.check_interval
+    regex_config.PARALLEL_WORKERS = args.parallel_workers
+    root_path = args.root_path or tempfile.mkdtemp(prefix="rsimulator-benchmarks-")
+    http_config.ROOT_PATH = root_path
+    results = []
+    try:
+        for content_type in args.content_types:
+            for shape in args.shapes:
+                for params, f in __benchmarks(root_path, content_type, shape, args):
+                    print(f"Measuring {params} {shape} {content_type}", file=sys.stderr)
+                    params = params | {"content_type": content_type, "shape": shape}
+                    results.append(params | measure(f, args.duration, args.iterations))
+    finally:
+        if not args.root_path:
+            shutil.rmtree(root_path)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "time": time.time(),
+        "arguments": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="benchmarks",
+        description="Benchmarks the matchers, find_matches, core.service and the http "
+        "apps with generated candidates, and reports the results as json.",
+    )
+    parser.add_argument(
+        "-c",
+        "--candidates",
+        type=int,
+        nargs="+",
+        default=[100, 1000],
+        help="numbers of candidates (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-t",
+        "--content-types",
+        nargs="+",
+        choices=CONTENT_TYPES,
+        default=list(CONTENT_TYPES),
+        help="content types (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-s",
+        "--shapes",
+        nargs="+",
+        choices=tuple(SHAPES),
+        default=list(SHAPES),
+        help="payload shapes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=SHAPES["deep"],
+        help="nesting depth of deep payloads (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--items",
+        type=int,
+        default=SHAPES["huge"],
+        help="number of items of huge payloads (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-d",
+        "--duration",
+        type=float,
+        default=1.0,
+        help="min seconds per benchmark (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-n",
+        "--iterations",
+        type=int,
+        default=5,
+        help="min calls per benchmark (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--check-interval",
+        type=float,
+        default=regex_config.CHECK_INTERVAL,
+        help="regex config.CHECK_INTERVAL (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache", action="store_true", help="enable config.CACHE of core.service"
+    )
+    parser.add_argument(
+        "--parallel-workers",
+        type=int,
+        default=regex_config.PARALLEL_WORKERS,
+        help="regex config.PARALLEL_WORKERS (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-r",
+        "--root-path",
+        help="directory for the generated candidates, kept after the run "
+        "(default: a temporary directory)",
+    )
+    parser.add_argument(
+        "-o", "--output", help="file to write the json results to (default: stdout)"
+    )
+    parsed = parser.parse_args(args)
+    results = json.dumps(run(parsed), indent=2)
+    if parsed.output:
+        with open(parsed.output, "wt") as f:
+            f.write(results)
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,7 @@
+import logging
+
 from rsimulator_core.core import service
 from rsimulator_core.data import *
+
+# Logging is configured by the application, see log_config.configure
+logging.getLogger(__name__).addHandler(logging.NullHandler())
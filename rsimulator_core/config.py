@@ -1,16 +1,46 @@
-import logging
-
 from rsimulator_core.regex import find_matches as regex_find_matches
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure the logging profile, "development" or "production", see
+# log_config.configure
+LOG_PROFILE = "development"
 
-# Configure caching on/off
+# Configure caching on/off, see decorators.cache
 CACHE = False
 
+# Configure the max number of cached responses
+CACHE_MAX_ENTRIES = 1000
+
+# Configure the max size in characters of cached responses, None means no limit
+CACHE_MAX_BYTES = None
+
+# Configure how long, in seconds, a response is cached, None means no limit
+CACHE_TTL = None
+
+# Configure how often, in seconds, the files under the root path of cached responses
+# are checked for changes, which scans all of them in the background. 0 means on
+# every call, before it is answered.
+CACHE_CHECK_INTERVAL = 1.0
+
+# Configure if cached responses are keyed by a digest of the request, instead of by
+# the request, i.e. if large requests are not kept by the cache
+CACHE_DIGEST = False
+
+# Configure how long, in seconds, a script that does not exist is assumed to still
+# not exist, see decorators.script. Existing scripts are checked on every call.
+SCRIPT_MISSING_TTL = 1.0
+
+# Configure if matching stops at the first matching candidate, in path order.
+# If False, all candidates are evaluated, e.g. to warn if more than one matches.
+FIRST_MATCH = False
+
 # Configure match functions.
 # Key corresponds to core.service content_type parameter
 # Value is to function to handle matching for a specific content_type
+# For many txt candidates, set the function of "txt" to
+# rsimulator_core.regex.find_matches_combined, which matches them all with one
+# combined regexp, see set_find_matches_function
+# The function is called with root_path, root_relative_path, request and
+# content_type, and only if FIRST_MATCH is True also with first_match True
 __match_functions = {
     "json": regex_find_matches,
     "txt": regex_find_matches,
@@ -20,3 +50,7 @@ __match_functions = {
 
 def get_find_matches_function(content_type: str) -> callable:
     return __match_functions.get(content_type, regex_find_matches)
+
+
+def set_find_matches_function(content_type: str, function: callable) -> None:
+    __match_functions[content_type] = function
@@ -1,14 +1,78 @@
 import logging
+from contextvars import ContextVar
+from time import perf_counter
 
-from rsimulator_core.config import get_find_matches_function
+import rsimulator_core.config as config
+from rsimulator_core import timing
 from rsimulator_core.data import Match
 from rsimulator_core.decorators import cache, script
 
 log = logging.getLogger(__name__)
+# One record per request, with the request and match as extra fields
+summary = logging.getLogger("rsimulator_core.summary")
+# The number of matches and no matches of the current call of service, None if it
+# did not match, i.e. it was cached or answered by global_request.py
+__counts: ContextVar[tuple[int, int] | None] = ContextVar("counts", default=None)
 
 
 @cache
 @script
+def __service(
+    root_path: str, root_relative_path: str, request: str, content_type: str, **kwargs
+) -> Match | None:
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Service called with: %s", locals())
+    find_matches = config.get_find_matches_function(content_type)
+    # Only passed if set, so find functions without the parameter still work
+    first_match = (True,) if config.FIRST_MATCH else ()
+    matches, no_matches = find_matches(
+        root_path, root_relative_path, request, content_type, *first_match
+    )
+    __counts.set((len(matches), len(no_matches)))
+    log.debug("No Matches: %s", no_matches)
+    log.debug("Matches: %s", matches)
+    if len(matches) == 0:
+        log.warning("No candidates matches %s", root_relative_path)
+        log.debug("Returning None")
+        return None
+    if len(matches) > 1:
+        log.warning(
+            "%d candidates matches: %s",
+            len(matches),
+            [m.candidate_path for m in matches],
+        )
+    log.debug("Service returning: %s", matches[0])
+    return matches[0]
+
+
+def __summarize(
+    root_relative_path: str,
+    request: str,
+    content_type: str,
+    response: Match | None,
+    counts: tuple[int, int] | None,
+    duration: float,
+) -> None:
+    if counts is None:
+        message, args = "Service answered without matching, e.g. cached", ()
+    else:
+        message, args = "Service matched %d of %d candidates", (counts[0], sum(counts))
+    summary.info(
+        message,
+        *args,
+        extra={
+            "root_relative_path": root_relative_path,
+            "content_type": content_type,
+            "request_size": len(request),
+            "candidate_path": getattr(response, "candidate_path", None),
+            "cached": counts is None,
+            "matches": counts and counts[0],
+            "no_matches": counts and counts[1],
+            "duration": duration,
+        },
+    )
+
+
 def service(
     root_path: str, root_relative_path: str, request: str, content_type: str, **kwargs
 ) -> Match | None:
@@ -18,24 +82,33 @@ def service(
     The content_type parameter is used to
     1. Decide matcher
     2. Find only files with this extension
+    If config.FIRST_MATCH is True, the first match in path order is returned without
+    evaluating the remaining candidates.
 
     All no matches are logged on debug level, including information why they not match.
     All matches are logged on debug level.
     If no match is found, it is logged on warning level.
     If more than one match is found, it is logged on warning level.
+    The whole call, also if cached, is recorded as the "service" phase, see timing,
+    and logged on info level by the rsimulator_core.summary logger.
     """
-    log.debug("Service called with: %s", locals())
-    find_matches = get_find_matches_function(content_type)
-    matches, no_matches = find_matches(
-        root_path, root_relative_path, request, content_type
-    )
-    log.debug("No Matches: %s", no_matches)
-    log.debug("Matches: %s", matches)
-    if len(matches) == 0:
-        log.warning("No candidates matches: %s", matches)
-        log.debug("Returning None")
-        return None
-    if len(matches) > 1:
-        log.warning("%d candidates matches: %s", len(matches), matches)
-    log.debug("Service returning: %s", matches[0])
-    return matches[0]
+    started = timing.start()
+    start = perf_counter()
+    token = __counts.set(None)
+    try:
+        response = __service(
+            root_path, root_relative_path, request, content_type, **kwargs
+        )
+        if summary.isEnabledFor(logging.INFO):
+            __summarize(
+                root_relative_path,
+                request,
+                content_type,
+                response,
+                __counts.get(),
+                perf_counter() - start,
+            )
+        return response
+    finally:
+        __counts.reset(token)
+        timing.record("service", started)
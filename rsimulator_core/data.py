@@ -1,6 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
+from rsimulator_core.template import Template
+
 
 @dataclass(frozen=True)
 class Error:
@@ -18,6 +20,9 @@ class Match:
     response_path: str
     response_raw: str
     response: str
+    # Set if the response is streamed from file, then response_raw and response are ""
+    template: Template | None = field(default=None, compare=False, repr=False)
+    groups: tuple[str, ...] = field(default=(), compare=False, repr=False)
 
 
 @dataclass(frozen=True)
@@ -26,3 +31,14 @@ class NoMatch:
     candidate_path: str
     candidate: str
     error: Error
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    bypasses: int
@@ -1,34 +1,343 @@
-import functools
 import logging
 import re
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from functools import wraps
-from os.path import exists
+from hashlib import blake2b
+from os import scandir, stat
+from threading import Lock, Thread
+from time import monotonic
+from types import CodeType
+from typing import Any
 
-from rsimulator_core.config import CACHE
+import rsimulator_core.config as config
+from rsimulator_core import timing
+from rsimulator_core.data import CacheStats
+from rsimulator_core.template import render, split
 
 log = logging.getLogger(__name__)
 
 
-def cache(f):
-    @wraps(f)
-    @functools.lru_cache(maxsize=1000, typed=False)
-    def cache_decorator(*args, **kwargs):
-        return f(*args, **kwargs)
+@dataclass
+class __Script:
+    code: CodeType | None
+    signature: tuple[int, int] | None
+    checked: float
+
+
+__scripts: dict[str, __Script] = {}
+__lock = Lock()
+
+
+def __stat(path: str) -> tuple[int, int] | None:
+    try:
+        s = stat(path)
+        return s.st_mtime_ns, s.st_size
+    except FileNotFoundError:
+        return None
 
-    return cache_decorator if CACHE else f
+
+def __compile(script_path: str) -> CodeType | None:
+    # Returns the compiled script, or None if it does not exist. The script is only
+    # compiled again if changed, and not checked again within config.SCRIPT_MISSING_TTL
+    # seconds if it did not exist.
+    now = monotonic()
+    script = __scripts.get(script_path)
+    if (
+        script
+        and script.code is None
+        and now - script.checked < config.SCRIPT_MISSING_TTL
+    ):
+        return None
+    signature = __stat(script_path)
+    if script and script.signature == signature:
+        script.checked = now
+        return script.code
+    code = None
+    if signature:
+        with open(script_path, "rt", encoding="utf-8") as s:
+            code = compile(s.read(), script_path, "exec")
+        log.debug("Compiled script %s", script_path)
+    with __lock:
+        __scripts[script_path] = __Script(code, signature, now)
+    return code
 
 
 def __execute(script_path, args, kwargs):
-    if exists(script_path):
+    if code := __compile(script_path):
+        started = timing.start()
         log.debug("Before executing script %s: %s, %s", script_path, args, kwargs)
-        with open(script_path, "rt", encoding="utf-8") as s:
-            c = s.read()
-            exec(c, {}, {"args": args, "kwargs": kwargs})
-            log.debug("After executing script %s: %s, %s", script_path, args, kwargs)
+        exec(code, {}, {"args": args, "kwargs": kwargs})
+        log.debug("After executing script %s: %s, %s", script_path, args, kwargs)
+        timing.record("script", started)
     else:
         log.debug("Script %s does not exist: %s, %s", script_path, args, kwargs)
 
 
+def __script_paths(root_path: str, response: Any) -> tuple[str, ...]:
+    paths = (f"{root_path}/global_request.py", f"{root_path}/global_response.py")
+    if response:
+        return paths + (re.sub(r"Request.[a-z]+", ".py", response.candidate_path),)
+    return paths
+
+
+def __is_dynamic(root_path: str, response: Any) -> bool:
+    # True if a script, that does more than nothing, can change the response
+    for script_path in __script_paths(root_path, response):
+        if code := __compile(script_path):
+            if code.co_names or code.co_consts not in ((), (None,)):
+                return True
+    return False
+
+
+@dataclass
+class __Cached:
+    root_path: str
+    value: Any
+    size: int
+    expires: float | None
+    # The index of the argument that is value.request, which is then not kept
+    request_index: int | None = None
+
+
+@dataclass
+class __Root:
+    signature: tuple[tuple[str, int, int], ...]
+    checked: float
+    # If it is being scanned in the background, see __check_root
+    scanning: bool = False
+
+
+__cached: OrderedDict[tuple, __Cached] = OrderedDict()
+__roots: dict[str, __Root] = {}
+__cache_lock = Lock()
+__bytes = 0
+__hits = 0
+__misses = 0
+__evictions = 0
+__invalidations = 0
+__bypasses = 0
+
+
+def __signature(root_path: str) -> tuple[tuple[str, int, int], ...]:
+    # The path, mtime and size of all files under root_path, skipping those that
+    # cannot be read, e.g. dangling symlinks
+    files = []
+
+    def scan(path: str) -> None:
+        try:
+            with scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            scan(entry.path)
+                        else:
+                            s = entry.stat()
+                            files.append((entry.path, s.st_mtime_ns, s.st_size))
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+
+    scan(root_path)
+    return tuple(sorted(files))
+
+
+def __remove(key: tuple) -> None:
+    global __bytes
+    __bytes -= __cached.pop(key).size
+
+
+def __scan_root(root_path: str, now: float) -> None:
+    # Removes the cached responses of root_path if any file under it has changed
+    global __invalidations
+    signature = __signature(root_path)
+    with __cache_lock:
+        root = __roots.get(root_path)
+        if root and root.signature != signature:
+            for key in [k for k, c in __cached.items() if c.root_path == root_path]:
+                __remove(key)
+                __invalidations += 1
+            log.debug("Files changed in %s, cached responses removed", root_path)
+        __roots[root_path] = __Root(signature, now)
+
+
+def __check_root(root_path: str, now: float) -> None:
+    # Scans root_path at most every config.CACHE_CHECK_INTERVAL seconds. The first
+    # scan, and every scan if the interval is 0, is done by the caller, the others in
+    # the background, so that requests do not wait for them.
+    with __cache_lock:
+        root = __roots.get(root_path)
+        interval = config.CACHE_CHECK_INTERVAL
+        if root and (root.scanning or now - root.checked < interval):
+            return
+        if root and interval > 0:
+            root.scanning = True
+            Thread(
+                target=__scan_root,
+                args=(root_path, now),
+                name="rsimulator-cache-check",
+                daemon=True,
+            ).start()
+            return
+    __scan_root(root_path, now)
+
+
+def __size(value: Any) -> int:
+    if value is None:
+        return 0
+    return sum(len(v) for v in vars(value).values() if isinstance(v, str))
+
+
+def __digest(args: tuple, kwargs: dict) -> bytes:
+    h = blake2b(digest_size=16)
+    for value in args + tuple(sorted(kwargs.items())):
+        b = (value if isinstance(value, str) else repr(value)).encode(
+            "utf-8", "surrogatepass"
+        )
+        h.update(len(b).to_bytes(8, "little"))
+        h.update(b)
+    return h.digest()
+
+
+def __request_index(args: tuple, value: Any) -> int | None:
+    request = getattr(value, "request", None)
+    for index, arg in enumerate(args):
+        if request is not None and arg is request:
+            return index
+    return None
+
+
+def __put(
+    key: tuple,
+    root_path: str,
+    value: Any,
+    now: float,
+    request_index: int | None = None,
+) -> None:
+    global __bytes, __evictions
+    if request_index is not None:
+        value = replace(value, request="")
+    size = __size(value)
+    max_bytes = config.CACHE_MAX_BYTES
+    if max_bytes is not None and size > max_bytes:
+        return
+    with __cache_lock:
+        if key in __cached:
+            __remove(key)
+        ttl = config.CACHE_TTL
+        __cached[key] = __Cached(
+            root_path, value, size, None if ttl is None else now + ttl, request_index
+        )
+        __bytes += size
+        while len(__cached) > config.CACHE_MAX_ENTRIES or (
+            max_bytes is not None and __bytes > max_bytes
+        ):
+            __remove(next(iter(__cached)))
+            __evictions += 1
+
+
+def __get(key: tuple, now: float) -> __Cached | None:
+    global __hits, __misses
+    with __cache_lock:
+        cached = __cached.get(key)
+        if cached and cached.expires is not None and cached.expires <= now:
+            __remove(key)
+            cached = None
+        if cached:
+            __cached.move_to_end(key)
+            __hits += 1
+            return cached
+        __misses += 1
+        return None
+
+
+def cache(f):
+    """
+    Caches the responses of f, if config.CACHE is True.
+    The first argument of f must be the root path of the simulator files. If any file
+    under it changes, its cached responses are removed, within
+    config.CACHE_CHECK_INTERVAL seconds. Unless 0, the files are checked in the
+    background.
+    Responses that a script can change, are not cached.
+    If config.CACHE_DIGEST is True, responses are keyed by a digest of the arguments
+    and a cached Match does not keep its request, i.e. large requests are not kept.
+    The cache is bounded by config.CACHE_MAX_ENTRIES, config.CACHE_MAX_BYTES and
+    config.CACHE_TTL, and the least recently used responses are evicted first.
+    """
+
+    @wraps(f)
+    def cache_decorator(*args, **kwargs):
+        global __bypasses
+        if not config.CACHE:
+            return f(*args, **kwargs)
+        digest = config.CACHE_DIGEST
+        if digest:
+            key = (args[0], __digest(args, kwargs))
+        else:
+            key = (args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                with __cache_lock:
+                    __bypasses += 1
+                return f(*args, **kwargs)
+        now = monotonic()
+        __check_root(args[0], now)
+        if cached := __get(key, now):
+            if cached.request_index is None:
+                return cached.value
+            return replace(cached.value, request=args[cached.request_index])
+        value = f(*args, **kwargs)
+        if __is_dynamic(args[0], value):
+            with __cache_lock:
+                __bypasses += 1
+        else:
+            __put(
+                key,
+                args[0],
+                value,
+                now,
+                __request_index(args, value) if digest else None,
+            )
+        return value
+
+    return cache_decorator
+
+
+def cache_stats() -> CacheStats:
+    with __cache_lock:
+        return CacheStats(
+            entries=len(__cached),
+            bytes=__bytes,
+            hits=__hits,
+            misses=__misses,
+            evictions=__evictions,
+            invalidations=__invalidations,
+            bypasses=__bypasses,
+        )
+
+
+def cache_clear() -> None:
+    global __bytes, __hits, __misses, __evictions, __invalidations, __bypasses
+    with __cache_lock:
+        __cached.clear()
+        __roots.clear()
+        __bytes = __hits = __misses = __evictions = __invalidations = __bypasses = 0
+
+
+def __read_template(match: Any) -> Any:
+    with open(match.template.path, "rt", encoding="utf-8") as f:
+        response_raw = f.read()
+    return replace(
+        match,
+        response_raw=response_raw,
+        response=render(split(response_raw), match.groups),
+        template=None,
+        groups=(),
+    )
+
+
 def script(f):
     @wraps(f)
     def decorator(*args, **kwargs):
@@ -44,12 +353,15 @@ def script(f):
         kws["response"] = response
 
         if response:
+            local_path = re.sub(r"Request.[a-z]+", ".py", response.candidate_path)
+            global_path = f"{args[0]}/global_response.py"
+            if response.template and (__compile(local_path) or __compile(global_path)):
+                # Scripts get and can change the response, so it is not streamed
+                kws["response"] = __read_template(response)
             # local response
-            __execute(
-                re.sub(r"Request.[a-z]+", ".py", response.candidate_path), args, kws
-            )
+            __execute(local_path, args, kws)
             # Global response
-            __execute(f"{args[0]}/global_response.py", args, kws)
+            __execute(global_path, args, kws)
         return kws["response"]
 
     return decorator
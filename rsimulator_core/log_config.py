@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+import rsimulator_core.config as config
+
+__format = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+__handler: logging.Handler | None = None
+__listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a json object with time, level, logger, message and the extra
+    fields of the record, e.g. of the request summaries of core.service.
+    """
+
+    # Attributes of every record, i.e. not extra fields
+    record_attributes = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        value = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, field in vars(record).items():
+            if key not in self.record_attributes:
+                value[key] = field
+        if record.exc_info:
+            value["exception"] = self.formatException(record.exc_info)
+        return json.dumps(value, default=str)
+
+
+class __QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The record is formatted by the listener thread, not by the logging thread
+        return record
+
+
+def __development() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(__format))
+    logging.getLogger().setLevel(logging.DEBUG)
+    logging.getLogger("rsimulator_core.summary").setLevel(logging.NOTSET)
+    return handler
+
+
+def __production() -> logging.Handler:
+    global __listener
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    __listener = QueueListener(records, handler, respect_handler_level=True)
+    __listener.start()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("rsimulator_core.summary").setLevel(logging.INFO)
+    return __QueueHandler(records)
+
+
+__profiles = {
+    "development": __development,
+    "production": __production,
+}
+
+
+def configure(profile: str | None = None) -> None:
+    """
+    Configures the root logger with a logging profile, config.LOG_PROFILE if None.
+    - development: everything on debug level, formatted as text when logged
+    - production: warnings and request summaries, formatted as json in a listener
+      thread, so that logging does not block the logging threads
+    A previously configured profile is replaced. Importing rsimulator_core does not
+    configure logging.
+    """
+    global __handler
+    stop()
+    root = logging.getLogger()
+    if __handler:
+        root.removeHandler(__handler)
+    __handler = __profiles[profile or config.LOG_PROFILE]()
+    root.addHandler(__handler)
+
+
+def stop() -> None:
+    """
+    Stops the listener thread of the production profile, after it has handled the
+    queued records.
+    """
+    global __listener
+    if __listener:
+        __listener.stop()
+        __listener = None
+
+
+def __before_fork() -> None:
+    # A listener thread does not survive fork and could hold the queue lock
+    if __listener:
+        __listener.stop()
+
+
+def __after_fork() -> None:
+    if __listener:
+        __listener.start()
+
+
+os.register_at_fork(
+    before=__before_fork,
+    after_in_parent=__after_fork,
+    after_in_child=__after_fork,
+)
@@ -0,0 +1,153 @@
+import json
+import logging
+import random
+import re
+from dataclasses import dataclass
+from functools import partial
+from os import stat
+from os.path import dirname, join, normpath
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+import rsimulator_core.regex.config as regex_config
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Profile:
+    """
+    Simulated latency, in seconds, and bandwidth, in bytes per second, of a response.
+    Read from json, e.g. {"latency": {"type": "uniform", "min": 0.1, "max": 0.3},
+    "bandwidth": 100000}, where the latency type is one of
+    - fixed, with value
+    - uniform, with min and max
+    - normal, with mean and stddev
+    - percentiles, with table, e.g. {"50": 0.1, "99": 0.5}, interpolated linearly
+    """
+
+    latency: Callable[[], float]
+    bandwidth: float | None = None
+
+    def delay(self) -> float:
+        return self.latency()
+
+
+@dataclass
+class __Entry:
+    profile: Profile | None
+    signature: tuple[int, int] | None
+    checked: float
+
+
+__entries: dict[str, __Entry] = {}
+__lock = Lock()
+
+
+def __fixed(latency: dict[str, Any]) -> Callable[[], float]:
+    value = float(latency["value"])
+    return lambda: value
+
+
+def __uniform(latency: dict[str, Any]) -> Callable[[], float]:
+    return partial(random.uniform, float(latency["min"]), float(latency["max"]))
+
+
+def __normal(latency: dict[str, Any]) -> Callable[[], float]:
+    mean, stddev = float(latency["mean"]), float(latency["stddev"])
+    return lambda: max(0.0, random.gauss(mean, stddev))
+
+
+def __interpolate(table: tuple[tuple[float, float], ...]) -> float:
+    percentile = random.uniform(0.0, 100.0)
+    previous = (0.0, table[0][1])
+    for point in table:
+        if percentile <= point[0]:
+            if point[0] == previous[0]:
+                return point[1]
+            share = (percentile - previous[0]) / (point[0] - previous[0])
+            return previous[1] + (point[1] - previous[1]) * share
+        previous = point
+    return table[-1][1]
+
+
+def __percentiles(latency: dict[str, Any]) -> Callable[[], float]:
+    table = tuple(sorted((float(k), float(v)) for k, v in latency["table"].items()))
+    if not table or table[0][0] < 0 or table[-1][0] > 100:
+        raise ValueError(f"Invalid percentiles: {latency['table']}")
+    return partial(__interpolate, table)
+
+
+__latency_functions = {
+    "fixed": __fixed,
+    "uniform": __uniform,
+    "normal": __normal,
+    "percentiles": __percentiles,
+}
+
+
+def parse(text: str) -> Profile:
+    value = json.loads(text)
+    latency = value.get("latency", {"value": 0})
+    bandwidth = value.get("bandwidth")
+    if bandwidth is not None and bandwidth <= 0:
+        raise ValueError(f"Invalid bandwidth: {bandwidth}")
+    return Profile(
+        __latency_functions[latency.get("type", "fixed")](latency),
+        None if bandwidth is None else float(bandwidth),
+    )
+
+
+def __stat(path: str) -> tuple[int, int] | None:
+    try:
+        s = stat(path)
+        return s.st_mtime_ns, s.st_size
+    except FileNotFoundError:
+        return None
+
+
+def __load(path: str) -> Profile | None:
+    now = monotonic()
+    entry = __entries.get(path)
+    if entry and now - entry.checked < regex_config.CHECK_INTERVAL:
+        return entry.profile
+    signature = __stat(path)
+    if entry and entry.signature == signature:
+        entry.checked = now
+        return entry.profile
+    profile = None
+    if signature:
+        try:
+            with open(path, "rt", encoding="utf-8") as f:
+                profile = parse(f.read())
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            log.warning("Invalid profile %s: %r", path, e)
+    with __lock:
+        __entries[path] = __Entry(profile, signature, now)
+    return profile
+
+
+def get_profile(root_path: str, candidate_path: str) -> Profile | None:
+    """
+    Returns the profile of the candidate, read from its <name>Profile.json, e.g.
+    1_Profile.json for 1_Request.json, or else from the nearest Profile.json in its
+    directory or a parent directory within root_path.
+    Returns None if there is no profile.
+    The files are checked for changes as candidates, see store.load.
+    """
+    if profile := __load(re.sub(r"Request\.[a-z]+$", "Profile.json", candidate_path)):
+        return profile
+    root_path = normpath(root_path)
+    directory = normpath(dirname(candidate_path))
+    while True:
+        if profile := __load(join(directory, "Profile.json")):
+            return profile
+        if len(directory) <= len(root_path) or directory == dirname(directory):
+            return None
+        directory = dirname(directory)
+
+
+def clear() -> None:
+    with __lock:
+        __entries.clear()
@@ -1 +1,4 @@
+from rsimulator_core.regex.combined_matcher import (
+    find_matches as find_matches_combined,
+)
 from rsimulator_core.regex.matcher import find_matches
@@ -0,0 +1,107 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from threading import Lock
+
+from rsimulator_core.data import Match
+from rsimulator_core.regex import store
+from rsimulator_core.regex.data import Candidate, Groups, NoMatches
+from rsimulator_core.regex.matcher import create_match
+from rsimulator_core.regex.patterns import combinable
+from rsimulator_core.regex.txt_matcher import mismatch
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class __Combined:
+    candidates: tuple[Candidate, ...]
+    combinable: tuple[bool, ...]
+    # Alternations of the combinable candidates from an index, compiled when needed
+    alternations: dict[int, re.Pattern | None] = field(default_factory=dict)
+
+
+__combined: dict[tuple[str, str, str], __Combined] = {}
+__lock = Lock()
+
+
+def __get_combined(
+    key: tuple[str, str, str], candidates: tuple[Candidate, ...]
+) -> __Combined:
+    with __lock:
+        combined = __combined.get(key)
+        if (
+            combined is None
+            or len(combined.candidates) != len(candidates)
+            or any(a is not b for a, b in zip(combined.candidates, candidates))
+        ):
+            combined = __Combined(
+                candidates,
+                tuple(combinable(c.prepared.source) for c in candidates),
+            )
+            __combined[key] = combined
+            log.debug("Combined %d candidates for %s", len(candidates), key)
+        return combined
+
+
+def __get_alternation(combined: __Combined, start: int) -> re.Pattern | None:
+    if start not in combined.alternations:
+        alternatives = "|".join(
+            f"(?P<c{index}>{candidate.prepared.source})"
+            for index, candidate in enumerate(combined.candidates)
+            if index >= start and combined.combinable[index]
+        )
+        combined.alternations[start] = (
+            re.compile(f"(?ms)(?:{alternatives})") if alternatives else None
+        )
+    return combined.alternations[start]
+
+
+def __find_match(combined: __Combined, that: str, start: int) -> int | None:
+    # Returns the index of the first candidate from start that matches
+    winner = None
+    alternation = __get_alternation(combined, start)
+    if alternation and (m := alternation.fullmatch(that)):
+        winner = int(m.lastgroup[1:])
+    for index in range(start, len(combined.candidates) if winner is None else winner):
+        if not combined.combinable[index]:
+            if combined.candidates[index].prepared.pattern.fullmatch(that):
+                return index
+    return winner
+
+
+def find_matches(
+    root_path: str,
+    root_relative_path: str,
+    request: str,
+    content_type: str,
+    first_match: bool = False,
+) -> tuple[tuple[Match, ...], NoMatches]:
+    """
+    As matcher.find_matches for txt, but the candidates are combined into one
+    alternation, which finds the first matching candidate with one regexp execution.
+    Groups are then only captured for the matching candidate.
+    Candidates that cannot be combined, see patterns.combinable, are matched one by
+    one in path order.
+    """
+    candidates = store.candidates(root_path, root_relative_path, content_type)
+    combined = __get_combined((root_path, root_relative_path, content_type), candidates)
+    that = request.strip()
+    matches = []
+    failed = []
+    start = 0
+    while start < len(candidates):
+        index = __find_match(combined, that, start)
+        failed.extend(candidates[start:index])
+        if index is None:
+            break
+        candidate = candidates[index]
+        m = candidate.prepared.pattern.fullmatch(that)
+        matches.append(create_match(request, candidate, Groups(groups=m.groups())))
+        if first_match:
+            break
+        start = index + 1
+    log.debug("Matches: %s", matches)
+    return tuple(matches), NoMatches(
+        request, failed, lambda candidate: mismatch(candidate.prepared.text, request)
+    )
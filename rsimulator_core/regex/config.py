@@ -1,4 +1,4 @@
-from rsimulator_core.regex import json_matcher, txt_matcher, xml_matcher
+from rsimulator_core.regex import json_index, json_matcher, txt_matcher, xml_matcher
 
 # Configure match functions.
 # Key corresponds to core.service content_type parameter
@@ -9,6 +9,113 @@ __regex_match_functions = {
     "xml": xml_matcher.match,
 }
 
+# Configure prepare functions, i.e. functions that prepares candidates once when
+# they are loaded. Key and default as for the match functions.
+__regex_prepare_functions = {
+    "json": json_matcher.prepare,
+    "txt": txt_matcher.prepare,
+    "xml": xml_matcher.prepare,
+}
+
+# Configure prefilter functions, i.e. functions that returns a function that
+# cheaply rejects requests that a prepared candidate cannot match.
+# Key and default as for the match functions.
+__regex_prefilter_functions = {
+    "json": json_matcher.prefilter,
+    "txt": txt_matcher.prefilter,
+    "xml": xml_matcher.prefilter,
+}
+
+# Configure index functions, i.e. functions that returns Errors for the candidates
+# that an index shows cannot match a request.
+# Key corresponds to core.service content_type parameter, without default.
+__regex_index_functions = {
+    "json": json_index.reject,
+}
+
+# Configure if candidates are prefiltered, see e.g. json_matcher.prefilter.
+# If False, the error of a no match is always the one of the match function.
+PREFILTER = True
+
+# Configure if candidates are looked up in an index, see e.g. json_index.reject.
+# If False, the error of a no match is never the one of the index.
+INDEX = True
+
+# Configure the size, in bytes, above which responses are streamed from file instead
+# of read into memory, see rsimulator_core.template. None means never.
+STREAM_RESPONSE_SIZE = None
+
+# Configure how often, in seconds, simulator files are checked for changes, i.e. how
+# long changes may take to be served. 0 means that they are checked on every request,
+# which reads the directories and files of the candidates on every request.
+CHECK_INTERVAL = 1.0
+
+# Configure the number of worker processes that candidates are partitioned across,
+# see parallel.evaluate. 0 means that candidates are evaluated serially.
+PARALLEL_WORKERS = 0
+
+# Configure the min number of candidates evaluated in parallel. Fewer candidates are
+# evaluated serially, since it is faster than sending the request to the workers.
+PARALLEL_MIN_CANDIDATES = 1000
+
+# Configure the max time, in seconds, to wait for the worker processes, after which
+# they are restarted and the candidates are evaluated serially.
+PARALLEL_TIMEOUT = 10.0
+
+
+def get_content_types() -> tuple[str, ...]:
+    return tuple(__regex_match_functions)
+
 
 def get_regex_match_function(content_type: str) -> callable:
     return __regex_match_functions.get(content_type, txt_matcher.match)
+
+
+def get_regex_prepare_function(content_type: str) -> callable:
+    return __regex_prepare_functions.get(content_type, txt_matcher.prepare)
+
+
+def get_regex_prefilter_function(content_type: str) -> callable:
+    return __regex_prefilter_functions.get(content_type, txt_matcher.prefilter)
+
+
+def get_regex_index_function(content_type: str) -> callable:
+    return __regex_index_functions.get(content_type, lambda *args: {})
+
+
+def get_configuration(content_type: str) -> tuple:
+    """
+    Returns the functions and settings that matching candidates of content_type
+    depends on, e.g. to configure the processes of parallel.evaluate the same.
+    """
+    return (
+        __regex_match_functions.get(content_type),
+        __regex_prepare_functions.get(content_type),
+        __regex_prefilter_functions.get(content_type),
+        __regex_index_functions.get(content_type),
+        PREFILTER,
+        INDEX,
+        STREAM_RESPONSE_SIZE,
+        CHECK_INTERVAL,
+    )
+
+
+def set_configuration(content_type: str, configuration: tuple) -> None:
+    """
+    Sets the functions and settings returned by get_configuration.
+    """
+    global PREFILTER, INDEX, STREAM_RESPONSE_SIZE, CHECK_INTERVAL
+    *functions, PREFILTER, INDEX, STREAM_RESPONSE_SIZE, CHECK_INTERVAL = configuration
+    for registry, function in zip(
+        (
+            __regex_match_functions,
+            __regex_prepare_functions,
+            __regex_prefilter_functions,
+            __regex_index_functions,
+        ),
+        functions,
+    ):
+        if function is None:
+            registry.pop(content_type, None)
+        else:
+            registry[content_type] = function
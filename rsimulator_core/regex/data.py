@@ -1,6 +1,125 @@
+import re
+from collections.abc import Sequence
 from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable
+
+from rsimulator_core import timing
+from rsimulator_core.data import Error, NoMatch
+from rsimulator_core.regex.patterns import get_pattern
+from rsimulator_core.template import Template
 
 
 @dataclass(frozen=True)
 class Groups:
     groups: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True, eq=False)
+class Prepared:
+    """
+    A candidate ("this") prepared once by a matcher, see e.g. json_matcher.prepare.
+    text is the candidate as read, source the regular expression it represents,
+    value the parsed candidate and error the message if it could not be parsed.
+    forms are the forms of value memoized by the matcher, e.g. canonicalized.
+    """
+
+    text: str
+    source: str
+    value: Any = None
+    error: str | None = None
+    forms: Any = None
+
+    @cached_property
+    def pattern(self) -> re.Pattern:
+        return get_pattern(self.source)
+
+
+class Request:
+    """
+    A request ("that") to be matched with many candidates.
+    Values derived from the request, e.g. the parsed request, are computed on first
+    use and then shared by all candidates, see get.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.__values: dict[str, Any] = {}
+
+    def get(self, key: str, compute: Callable[[str], Any]) -> Any:
+        if key not in self.__values:
+            started = timing.start()
+            self.__values[key] = compute(self.text)
+            timing.record("parse", started)
+        return self.__values[key]
+
+
+@dataclass(frozen=True, eq=False)
+class Candidate:
+    path: str
+    prepared: Prepared
+    response_path: str
+    response: str | None
+    # Returns an Error if the candidate cannot match the request, else None
+    reject: Callable[[Request], Error | None] = lambda request: None
+    # Set if the response is streamed from file, then response is None
+    template: Template | None = None
+    # The response split at its placeholders, see rsimulator_core.template.split
+    response_parts: tuple[str | int, ...] | None = None
+    # The mtime and size of the file at path when loaded, see store.load
+    signature: tuple[int, int] | None = None
+
+
+class NoMatches(Sequence):
+    """
+    The NoMatch of each of candidates, created when first accessed, e.g. when logged
+    on debug level. error returns the Error of a candidate.
+    Compares equal to the tuple of the NoMatch.
+    """
+
+    def __init__(
+        self,
+        request: str,
+        candidates: Sequence[Candidate],
+        error: Callable[[Candidate], Error],
+    ) -> None:
+        self.__request = request
+        self.__candidates = candidates
+        self.__error = error
+
+    @cached_property
+    def __no_matches(self) -> tuple[NoMatch, ...]:
+        return tuple(
+            NoMatch(self.__request, c.path, c.prepared.text, self.__error(c))
+            for c in self.__candidates
+        )
+
+    def __len__(self) -> int:
+        return len(self.__candidates)
+
+    def __getitem__(self, index):
+        return self.__no_matches[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, NoMatches):
+            other = tuple(other)
+        return isinstance(other, tuple) and self.__no_matches == other
+
+    def __repr__(self) -> str:
+        return repr(self.__no_matches)
+
+
+@dataclass(frozen=True)
+class IndexStats:
+    keys: int
+    directories: int
+    entries: int
+    rebuilds: int
+    build_time: float
+
+
+@dataclass(frozen=True)
+class StoreStats:
+    entries: int
+    loads: int
+    load_time: float
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from rsimulator_core.data import Error
+
+# Returned by the matchers instead of an Error that describes why a candidate does
+# not match, when not diagnosing
+NOT_DIAGNOSED = Error(None, None, None, "Not diagnosed")
+
+__diagnosing: ContextVar[bool] = ContextVar("diagnosing", default=True)
+
+
+def diagnosing() -> bool:
+    return __diagnosing.get()
+
+
+@contextmanager
+def diagnose(enabled: bool = True) -> Iterator[None]:
+    """
+    Sets if the matchers describe why candidates do not match, in the current
+    context, e.g. thread. They do by default.
+    """
+    token = __diagnosing.set(enabled)
+    try:
+        yield
+    finally:
+        __diagnosing.reset(token)
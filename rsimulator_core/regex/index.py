@@ -0,0 +1,152 @@
+import logging
+from dataclasses import dataclass, field
+from os import scandir, stat
+from os.path import dirname
+from threading import Lock
+from time import monotonic, perf_counter
+
+import rsimulator_core.regex.config as config
+from rsimulator_core.regex.data import IndexStats
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class __Directory:
+    mtime_ns: int
+    files: tuple[str, ...]
+    directories: tuple[str, ...]
+
+
+@dataclass
+class __Entry:
+    directories: dict[str, "__Directory"] = field(default_factory=dict)
+    paths: tuple[str, ...] = ()
+    checked: float | None = None
+
+
+__entries: dict[tuple[str, str, str], __Entry] = {}
+__lock = Lock()
+__rebuilds = 0
+__build_time = 0.0
+
+
+def __scan(path: str, ending: str) -> __Directory | None:
+    # Same selection as glob(f"{path}/**/*Request.{ending}", recursive=True),
+    # i.e. hidden files and directories are ignored, as are those that cannot be
+    # read.
+    suffix = f"Request.{ending}"
+    files, directories = [], []
+    try:
+        mtime_ns = stat(path).st_mtime_ns
+        with scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir():
+                    directories.append(entry.path)
+                elif entry.name.endswith(suffix):
+                    files.append(entry.path)
+    except OSError:
+        return None
+    return __Directory(mtime_ns, tuple(files), tuple(directories))
+
+
+def __scan_tree(directories: dict[str, __Directory], path: str, ending: str) -> None:
+    if directory := __scan(path, ending):
+        directories[path] = directory
+        for child in directory.directories:
+            __scan_tree(directories, child, ending)
+
+
+def __remove_tree(directories: dict[str, __Directory], path: str) -> None:
+    if directory := directories.pop(path, None):
+        for child in directory.directories:
+            __remove_tree(directories, child)
+
+
+def __refresh(entry: __Entry, base_path: str, ending: str) -> bool:
+    """
+    Rescans the directories of the entry whose mtime have changed, i.e. where files
+    or directories have been added, removed or renamed.
+    Returns True if the entry has been changed.
+    """
+    if not entry.directories:
+        __scan_tree(entry.directories, base_path, ending)
+        return bool(entry.directories)
+    changed = False
+    for path, directory in tuple(entry.directories.items()):
+        if path not in entry.directories:
+            continue  # Removed as a child of a previously refreshed directory
+        try:
+            if stat(path).st_mtime_ns == directory.mtime_ns:
+                continue
+        except OSError:
+            pass
+        changed = True
+        rescanned = __scan(path, ending)
+        for child in directory.directories:
+            if not rescanned or child not in rescanned.directories:
+                __remove_tree(entry.directories, child)
+        if rescanned:
+            entry.directories[path] = rescanned
+            for child in rescanned.directories:
+                if child not in entry.directories:
+                    __scan_tree(entry.directories, child, ending)
+        else:
+            entry.directories.pop(path, None)
+    return changed
+
+
+def find(root_path: str, root_relative_path: str, content_type: str) -> tuple[str, ...]:
+    """
+    Returns the sorted paths of all files named *Request.<content_type> recursively
+    found in <root_path>/<root_relative_path>.
+    The paths are kept in an in-memory index that is built on first call and then
+    incrementally updated from directory mtimes, at most every config.CHECK_INTERVAL
+    seconds. Nothing is kept for a path that does not exist, e.g. a misspelled one.
+    """
+    global __rebuilds, __build_time
+    key = (root_path, root_relative_path, content_type)
+    with __lock:
+        entry = __entries.get(key) or __Entry()
+        now = monotonic()
+        if entry.checked is not None and now - entry.checked < config.CHECK_INTERVAL:
+            return entry.paths
+        start = perf_counter()
+        base_path = dirname(f"{root_path}/{root_relative_path}/**")
+        if __refresh(entry, base_path, content_type) or entry.checked is None:
+            entry.paths = tuple(
+                sorted(p for d in entry.directories.values() for p in d.files)
+            )
+            elapsed = perf_counter() - start
+            __rebuilds += 1
+            __build_time += elapsed
+            log.debug(
+                "Indexed %d candidates for %s in %fs", len(entry.paths), key, elapsed
+            )
+        entry.checked = now
+        if entry.directories:
+            __entries[key] = entry
+        else:
+            __entries.pop(key, None)
+        return entry.paths
+
+
+def stats() -> IndexStats:
+    with __lock:
+        return IndexStats(
+            keys=len(__entries),
+            directories=sum(len(e.directories) for e in __entries.values()),
+            entries=sum(len(e.paths) for e in __entries.values()),
+            rebuilds=__rebuilds,
+            build_time=__build_time,
+        )
+
+
+def clear() -> None:
+    global __rebuilds, __build_time
+    with __lock:
+        __entries.clear()
+        __rebuilds = 0
+        __build_time = 0.0
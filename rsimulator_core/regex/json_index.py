@@ -0,0 +1,124 @@
+import logging
+from dataclasses import dataclass, field
+from json import dumps
+from threading import Lock
+from typing import Any
+
+from rsimulator_core.data import Error
+from rsimulator_core.regex.data import Candidate, Request
+from rsimulator_core.regex.diagnostics import NOT_DIAGNOSED, diagnosing
+from rsimulator_core.regex.json_matcher import literals, load_request, tokens
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class __Group:
+    value: Any
+    token: str
+    candidates: list[Candidate] = field(default_factory=list)
+
+
+@dataclass
+class __Index:
+    candidates: tuple[Candidate, ...]
+    literals: dict[Candidate, tuple] = field(default_factory=dict)
+    # Path -> value key -> the candidates with that literal value at the path
+    paths: dict[tuple[str, ...], dict[tuple[str, Any], "__Group"]] = field(
+        default_factory=dict
+    )
+
+
+__indexes: dict[tuple[str, str], __Index] = {}
+__lock = Lock()
+
+
+def __key(value: Any) -> tuple[str, Any]:
+    # Type is part of the key, since e.g. True == 1
+    return type(value).__name__, value
+
+
+def __build(candidates: tuple[Candidate, ...], previous: __Index | None) -> __Index:
+    index = __Index(candidates)
+    for candidate in candidates:
+        found = previous.literals.get(candidate) if previous else None
+        if found is None:
+            found = literals(candidate.prepared)
+        index.literals[candidate] = found
+        for path, value, token in found:
+            group = index.paths.setdefault(path, {}).setdefault(
+                __key(value), __Group(value, token)
+            )
+            group.candidates.append(candidate)
+    return index
+
+
+def __get_index(key: tuple[str, str], candidates: tuple[Candidate, ...]) -> __Index:
+    with __lock:
+        index = __indexes.get(key)
+        if (
+            index is None
+            or len(index.candidates) != len(candidates)
+            or any(a is not b for a, b in zip(index.candidates, candidates))
+        ):
+            index = __build(candidates, index)
+            __indexes[key] = index
+            log.debug("Indexed %d paths for %s", len(index.paths), key)
+        return index
+
+
+def __lookup(that_object: Any, path: tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(that_object, dict):
+            return None
+        that_object = that_object.get(key, None)
+    return that_object
+
+
+def __error(path: tuple[str, ...], group: __Group, that_value: Any) -> Error:
+    return Error(
+        path,
+        str(group.value),
+        None if that_value is None else str(that_value),
+        f'Rejected by index, values not matching: "{group.value}" != "{that_value}"',
+    )
+
+
+def reject(
+    root_path: str,
+    root_relative_path: str,
+    candidates: tuple[Candidate, ...],
+    request: Request,
+) -> dict[Candidate, Error]:
+    """
+    Returns Errors for the candidates that cannot match the request, since the
+    request has not their literal value at a path, nor its token elsewhere, see
+    json_matcher.literals. The Errors are NOT_DIAGNOSED unless diagnosing, see
+    diagnostics.diagnose.
+    The candidates are indexed by path and literal value, so each distinct value is
+    looked up once in the tokens of the request, however many candidates have it.
+    """
+    that_object, error = load_request(request)
+    if error:
+        return {}
+    index = __get_index((root_path, root_relative_path), candidates)
+    that_tokens = tokens(request.text) | tokens(dumps(that_object))
+    diagnosed = diagnosing()
+    rejected = {}
+    for path, groups in index.paths.items():
+        that_value = __lookup(that_object, path)
+        that_key = None if isinstance(that_value, (dict, list)) else __key(that_value)
+        for key, group in groups.items():
+            if key == that_key or group.token in that_tokens:
+                continue
+            for candidate in group.candidates:
+                if candidate not in rejected:
+                    rejected[candidate] = (
+                        __error(path, group, that_value) if diagnosed else NOT_DIAGNOSED
+                    )
+    return rejected
+
+
+def clear() -> None:
+    with __lock:
+        __indexes.clear()
@@ -1,11 +1,14 @@
 import logging
 import re
+from dataclasses import dataclass, field
 from json import dumps, loads
 from json.decoder import JSONDecodeError
-from typing import Any
+from typing import Any, Callable
 
 from rsimulator_core.data import Error
-from rsimulator_core.regex.data import Groups
+from rsimulator_core.regex.data import Groups, Prepared, Request
+from rsimulator_core.regex.diagnostics import NOT_DIAGNOSED, diagnosing
+from rsimulator_core.regex.patterns import fullmatch, required_literals
 
 log = logging.getLogger(__name__)
 
@@ -16,6 +19,8 @@ def __error(
     that_str: str | None,
     message: str,
 ) -> Error:
+    if not diagnosing():
+        return NOT_DIAGNOSED
     return Error(parents, this_str, that_str, message)
 
 
@@ -31,7 +36,10 @@ def __match_default(this_value, that_value, parents: tuple[str, ...]) -> Error |
 
 
 def __match_dict(
-    this_dict: dict, that_dict: dict, parents: tuple[str, ...]
+    this_dict: dict,
+    that_dict: dict,
+    parents: tuple[str, ...],
+    forms: tuple["__Forms", "__Forms"],
 ) -> Error | Groups:
     if len(this_dict) != len(that_dict):
         return __error(parents, None, None, "Different number of keys")
@@ -46,7 +54,7 @@ def __match_dict(
                 f'Keys not matching: "{this_child_key}"',
             )
         child_match = __match_objects(
-            this_child_value, that_child_value, parents + (this_child_key,)
+            this_child_value, that_child_value, parents + (this_child_key,), forms
         )
         if isinstance(child_match, Error):
             if child_match.this is None:
@@ -61,7 +69,10 @@ def __match_dict(
 
 
 def __match_list(
-    this_list: list, that_list: list, parents: tuple[str, ...]
+    this_list: list,
+    that_list: list,
+    parents: tuple[str, ...],
+    forms: tuple["__Forms", "__Forms"],
 ) -> Error | Groups:
     if len(this_list) != len(that_list):
         return __error(
@@ -70,7 +81,7 @@ def __match_list(
     groups = tuple()
     for index, children in enumerate(zip(this_list, that_list)):
         this_child, that_child = children
-        child_match = __match_objects(this_child, that_child, parents + (index,))
+        child_match = __match_objects(this_child, that_child, parents + (index,), forms)
         if isinstance(child_match, Error):
             return child_match
         else:
@@ -83,7 +94,7 @@ def __match_str(
 ) -> Error | Groups:
     if this_str == that_str:
         return Groups()
-    if m := re.fullmatch(f"(?ms){this_str}", that_str):
+    if m := fullmatch(this_str, that_str):
         return Groups(groups=tuple(m.groups()))
     return __error(
         parents,
@@ -93,18 +104,78 @@ def __match_str(
     )
 
 
-def __canonicalize(an_object: Any) -> str:
-    if isinstance(an_object, dict):
-        return dumps(dict(sorted(an_object.items())))
-    if isinstance(an_object, list):
-        return dumps(sorted(an_object, key=str))
-    return dumps(an_object)
+# The forms of dicts and lists below are composed of the memoized forms of their
+# children, i.e. each object is serialized once, however deeply it is nested.
+
+
+@dataclass(frozen=True)
+class __Forms:
+    # The forms of the dicts and lists of a loaded candidate or request, by id.
+    # Kept by the owner of the objects, i.e. the Prepared or the Request.
+    dumped: dict[int, str] = field(default_factory=dict)
+    strings: dict[int, str] = field(default_factory=dict)
+    canonicals: dict[int, str] = field(default_factory=dict)
+
+
+def __dumps(an_object: Any, forms: __Forms) -> str:
+    # As json.dumps(an_object)
+    if not isinstance(an_object, (dict, list)):
+        return dumps(an_object)
+    key = id(an_object)
+    if key not in forms.dumped:
+        if isinstance(an_object, dict):
+            items = (f"{dumps(k)}: {__dumps(v, forms)}" for k, v in an_object.items())
+            forms.dumped[key] = f"{{{', '.join(items)}}}"
+        else:
+            forms.dumped[key] = f"[{', '.join(__dumps(v, forms) for v in an_object)}]"
+    return forms.dumped[key]
+
+
+def __str(an_object: Any, forms: __Forms) -> str:
+    # As str(an_object)
+    if not isinstance(an_object, (dict, list)):
+        return str(an_object)
+    key = id(an_object)
+    if key not in forms.strings:
+        if isinstance(an_object, dict):
+            items = (f"{k!r}: {__repr(v, forms)}" for k, v in an_object.items())
+            forms.strings[key] = f"{{{', '.join(items)}}}"
+        else:
+            forms.strings[key] = f"[{', '.join(__repr(v, forms) for v in an_object)}]"
+    return forms.strings[key]
+
+
+def __repr(an_object: Any, forms: __Forms) -> str:
+    # As repr(an_object)
+    return (
+        __str(an_object, forms)
+        if isinstance(an_object, (dict, list))
+        else repr(an_object)
+    )
+
+
+def __canonicalize(an_object: Any, forms: __Forms) -> str:
+    # As json.dumps of the dict sorted by key, or of the list sorted by str
+    if not isinstance(an_object, (dict, list)):
+        return dumps(an_object)
+    key = id(an_object)
+    if key not in forms.canonicals:
+        if isinstance(an_object, dict):
+            items = (
+                f"{dumps(k)}: {__dumps(v, forms)}" for k, v in sorted(an_object.items())
+            )
+            forms.canonicals[key] = f"{{{', '.join(items)}}}"
+        else:
+            values = sorted(an_object, key=lambda v: __str(v, forms))
+            forms.canonicals[key] = f"[{', '.join(__dumps(v, forms) for v in values)}]"
+    return forms.canonicals[key]
 
 
 def __match_objects(
     this_object: Any,
     that_object: Any,
     parents: tuple[str, ...],
+    forms: tuple[__Forms, __Forms],
 ) -> Error | Groups:
     # Return error if different types
     if type(this_object) != type(that_object):
@@ -118,28 +189,62 @@ def __match_objects(
     # Return if as canonicalized strings and are equal or match as regexp
     if type(this_object) in (dict, list, str):
         result = __match_str(
-            __canonicalize(this_object), __canonicalize(that_object), parents
+            __canonicalize(this_object, forms[0]),
+            __canonicalize(that_object, forms[1]),
+            parents,
         )
         if isinstance(result, Groups):
             return result
 
-    match_function = {
-        dict: __match_dict,
-        list: __match_list,
-        str: __match_str,
-    }.get(type(this_object), __match_default)
-    return match_function(this_object, that_object, parents)
+    if isinstance(this_object, dict):
+        return __match_dict(this_object, that_object, parents, forms)
+    if isinstance(this_object, list):
+        return __match_list(this_object, that_object, parents, forms)
+    if isinstance(this_object, str):
+        return __match_str(this_object, that_object, parents)
+    return __match_default(this_object, that_object, parents)
+
+
+def prepare(this: str) -> Prepared:
+    """
+    Prepares this, i.e. a candidate, to be matched by match.
+    """
+    try:
+        return Prepared(this, this, loads(this), forms=__Forms())
+    except JSONDecodeError as e:
+        return Prepared(this, this, error=f'Cannot load this "{this}": {e}')
+
+
+def __load(that: str) -> tuple[Any, str | None]:
+    try:
+        return loads(that), None
+    except JSONDecodeError as e:
+        return None, f'Cannot load that "{that}": {e}'
+
+
+def load_request(request: Request) -> tuple[Any, str | None]:
+    """
+    Returns the loaded request and None, or None and the error if it cannot be
+    loaded. The request is only loaded once, also if used by many candidates.
+    """
+    return request.get("json", __load)
+
+
+def __get_forms(request: Request) -> __Forms:
+    return request.get("json.forms", lambda _: __Forms())
 
 
-def match(this: str, that: str) -> Error | Groups:
+def match(this: str | Prepared, that: str | Request) -> Error | Groups:
     """
     Matches this and that.
-    The "this" can contain regular expressions.
+    The "this" can contain regular expressions, and can be prepared by prepare.
+    The "that" can be a Request, to load and canonicalize it only once when matched
+    with many candidates.
     Both "this" and "that" must be valid json, if they not as a whole matches with
     re.fullmatch(f"(?ms){r}", s).
     Returns an Error or a Groups object.
     """
-    if not (isinstance(this, str) and isinstance(that, str)):
+    if not (isinstance(this, (str, Prepared)) and isinstance(that, (str, Request))):
         # Return error if this and that are not strings
         return __error(
             (),
@@ -147,20 +252,193 @@ def match(this: str, that: str) -> Error | Groups:
             that,
             f'Values not strings: "{type(this)}" != "{type(that)}"',
         )
+    prepared = this if isinstance(this, Prepared) else prepare(this)
+    request = that if isinstance(that, Request) else Request(that)
+    that = request.text
 
     # Match this and that as strings and return if Match, i.e. no Error
-    result = __match_str(this, that, ())
-    if isinstance(result, Groups):
-        return result
+    if prepared.text == that:
+        return Groups()
+    if m := prepared.pattern.fullmatch(that):
+        return Groups(groups=tuple(m.groups()))
 
     # Load to Objects
-    objects = []
-    for name, json in ("this", this), ("that", that):
-        try:
-            objects.append(loads(json))
-        except JSONDecodeError as e:
-            return __error((), this, that, f'Cannot load {name} "{json}": {e}')
-    this_object, that_object = objects
+    if prepared.error:
+        return __error((), prepared.text, that, prepared.error)
+    that_object, error = load_request(request)
+    if error:
+        return __error((), prepared.text, that, error)
 
     # Match Objects
-    return __match_objects(this_object, that_object, ())
+    return __match_objects(
+        prepared.value,
+        that_object,
+        (),
+        (prepared.forms, __get_forms(request)),
+    )
+
+
+@dataclass(frozen=True)
+class __Node:
+    value: Any
+    canonical: str | None = None
+    literals: tuple[str, ...] = ()
+    value_literals: tuple[str, ...] = ()
+    children: Any = None
+
+
+def __node(an_object: Any, forms: __Forms) -> __Node:
+    if type(an_object) not in (dict, list, str):
+        return __Node(an_object)
+    canonical = __canonicalize(an_object, forms)
+    if isinstance(an_object, dict):
+        children = {key: __node(value, forms) for key, value in an_object.items()}
+        return __Node(an_object, canonical, required_literals(canonical), (), children)
+    if isinstance(an_object, list):
+        children = tuple(__node(value, forms) for value in an_object)
+        return __Node(an_object, canonical, required_literals(canonical), (), children)
+    return __Node(
+        an_object, canonical, required_literals(canonical), required_literals(an_object)
+    )
+
+
+def __reject_objects(
+    node: __Node, that_object: Any, parents: tuple[str, ...], forms: __Forms
+) -> Error | None:
+    # Same checks as __match_objects, but only with regexps replaced by their
+    # required literals, i.e. Error is returned only if __match_objects returns Error
+    this_object = node.value
+    if type(this_object) != type(that_object):
+        return __error(
+            parents,
+            str(this_object),
+            str(that_object),
+            "Rejected by prefilter, objects of different types: "
+            f"{type(this_object)}, {type(that_object)}",
+        )
+    if node.canonical is not None:
+        that_canonical = __canonicalize(that_object, forms)
+        if node.canonical == that_canonical or all(
+            literal in that_canonical for literal in node.literals
+        ):
+            return None
+    if isinstance(this_object, dict):
+        if len(this_object) != len(that_object):
+            return __error(
+                parents, None, None, "Rejected by prefilter, different number of keys"
+            )
+        for key, child in node.children.items():
+            if (that_child := that_object.get(key, None)) is None:
+                return __error(
+                    parents,
+                    key,
+                    None,
+                    f'Rejected by prefilter, keys not matching: "{key}"',
+                )
+            if error := __reject_objects(child, that_child, parents + (key,), forms):
+                return error
+    elif isinstance(this_object, list):
+        if len(this_object) != len(that_object):
+            return __error(
+                parents,
+                str(this_object),
+                str(that_object),
+                "Rejected by prefilter, different length of lists",
+            )
+        for index, children in enumerate(zip(node.children, that_object)):
+            child, that_child = children
+            if error := __reject_objects(child, that_child, parents + (index,), forms):
+                return error
+    elif isinstance(this_object, str):
+        for literal in node.value_literals if this_object != that_object else ():
+            if literal not in that_object:
+                return __error(
+                    parents,
+                    this_object,
+                    that_object,
+                    f'Rejected by prefilter, "{literal}" not found',
+                )
+    elif this_object != that_object:
+        return __error(
+            parents,
+            str(this_object),
+            str(that_object),
+            f'Rejected by prefilter, values not matching: "{this_object}" != "{that_object}"',
+        )
+    return None
+
+
+def prefilter(prepared: Prepared) -> Callable[[Request], Error | None]:
+    """
+    Returns a function that cheaply returns an Error if the prepared candidate cannot
+    match a request, else None.
+    Regular expressions are not evaluated, instead the literals they require must be
+    found, in the request as a whole or in its objects.
+    """
+    literals = required_literals(prepared.source)
+    node = None if prepared.error else __node(prepared.value, prepared.forms)
+
+    def reject(request: Request) -> Error | None:
+        that = request.text
+        if prepared.text == that:
+            return None
+        if all(literal in that for literal in literals):
+            return None
+        if prepared.error:
+            return __error((), prepared.text, that, prepared.error)
+        that_object, error = load_request(request)
+        if error:
+            return __error((), prepared.text, that, error)
+        return __reject_objects(node, that_object, (), __get_forms(request))
+
+    return reject
+
+
+__plain = re.compile(r"[\w-]+", re.ASCII)
+
+
+def __token(value: Any) -> str | None:
+    if isinstance(value, str):
+        token = value
+    elif isinstance(value, (bool, int)):
+        token = dumps(value)
+    else:
+        return None
+    return token if __plain.fullmatch(token) else None
+
+
+def literals(prepared: Prepared) -> tuple[tuple[tuple[str, ...], Any, str], ...]:
+    """
+    Returns the literal values of the prepared candidate as (path, value, token),
+    where path is the keys to the value and token the value as in json.
+    Only values required by the regexps that can match a whole parent are returned,
+    i.e. a request that does not contain the token cannot match the candidate.
+    Since the token is then required together with its delimiters, e.g. quotes, it
+    is one of the tokens of such a request, see tokens.
+    """
+    if prepared.error or not isinstance(prepared.value, dict):
+        return ()
+    found = []
+
+    def find(this_dict: dict, path: tuple[str, ...], guards: tuple) -> None:
+        guards += (required_literals(__canonicalize(this_dict, prepared.forms)),)
+        for key, value in this_dict.items():
+            if isinstance(value, dict):
+                find(value, path + (key,), guards)
+            elif (
+                (token := __token(value))
+                and token in prepared.text
+                and all(any(token in literal for literal in g) for g in guards)
+            ):
+                found.append((path + (key,), value, token))
+
+    find(prepared.value, (), (required_literals(prepared.source),))
+    return tuple(found)
+
+
+def tokens(text: str) -> set[str]:
+    """
+    Returns the maximal runs of text that can be the token of a literal, see
+    literals.
+    """
+    return set(__plain.findall(text))
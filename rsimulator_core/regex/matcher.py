@@ -1,60 +1,175 @@
 import logging
-from glob import glob
-from os.path import dirname, sep
+from time import perf_counter
+from typing import Callable
 
-from rsimulator_core.data import Error, Match, NoMatch
-from rsimulator_core.regex.config import get_regex_match_function
-from rsimulator_core.regex.data import Groups
+import rsimulator_core.regex.config as config
+from rsimulator_core import timing
+from rsimulator_core.data import Error, Match
+from rsimulator_core.regex import parallel, store
+from rsimulator_core.regex.config import (
+    get_regex_index_function,
+    get_regex_match_function,
+)
+from rsimulator_core.regex.data import Candidate, Groups, NoMatches, Request
+from rsimulator_core.regex.diagnostics import diagnose
+from rsimulator_core.template import render, split
 
 log = logging.getLogger(__name__)
 
 
-def find_matches(
-    root_path: str, root_relative_path: str, request: str, content_type: str
-) -> tuple[tuple[Match, ...], tuple[NoMatch, ...]]:
-    no_matches = []
-    matches = []
+def evaluator(
+    root_path: str,
+    root_relative_path: str,
+    content_type: str,
+    candidates: tuple[Candidate, ...],
+    request: Request,
+) -> Callable[[Candidate], Error | Groups]:
+    """
+    Returns a function that evaluates one of candidates against request, i.e. rejects
+    it by index, stream or prefilter if configured, or else matches it.
+    """
     match = get_regex_match_function(content_type)
-    for candidate_path in __find(root_path, root_relative_path, content_type):
-        candidate = __read(candidate_path)
-        result = match(candidate, request)
-        log.debug("Match result for %s: %s", candidate_path, result)
-        if isinstance(result, Error):
-            no_matches.append(NoMatch(request, candidate_path, candidate, result))
-        else:
-            response_path = __get_response_path(candidate_path)
-            response_raw = __read(response_path)
-            response = __replace_response(result, response_raw)
-            matches.append(
-                Match(
-                    request,
-                    candidate_path,
-                    candidate,
-                    response_path,
-                    response_raw,
-                    response,
-                )
-            )
-    log.debug("Matches: %s", matches)
-    return tuple(matches), tuple(no_matches)
+    excluded = (
+        get_regex_index_function(content_type)(
+            root_path, root_relative_path, candidates, request
+        )
+        if config.INDEX
+        else {}
+    )
 
+    def evaluate(candidate: Candidate) -> Error | Groups:
+        rejected = excluded.get(candidate) or (
+            config.PREFILTER and candidate.reject(request)
+        )
+        return rejected or match(candidate.prepared, request)
 
-def __replace_response(result: Groups, response: str) -> str:
-    for index, val in enumerate(result.groups, start=1):
-        response = response.replace("${" + str(index) + "}", val)
-    return response
+    return evaluate
+
+
+def evaluate(
+    root_path: str,
+    root_relative_path: str,
+    content_type: str,
+    candidates: tuple[Candidate, ...],
+    request: Request,
+    first_match: bool = False,
+) -> list[tuple[int, Groups]]:
+    """
+    Returns the positions in candidates, and the groups, of the candidates that match
+    request, in order. No match is diagnosed.
+    If first_match is True, candidates after the first match are not evaluated.
+    """
+    matched = []
+    evaluate_candidate = evaluator(
+        root_path, root_relative_path, content_type, candidates, request
+    )
+    sink = timing.get_sink()
+    with diagnose(False):
+        for position, candidate in enumerate(candidates):
+            if sink:
+                started = perf_counter()
+                result = evaluate_candidate(candidate)
+                sink("match", perf_counter() - started)
+            else:
+                result = evaluate_candidate(candidate)
+            if not isinstance(result, Error):
+                matched.append((position, result))
+                if first_match:
+                    break
+    return matched
 
 
-def __get_response_path(request_path: str) -> str:
-    return f'{dirname(request_path)}/{request_path.split(sep)[-1].replace("Request", "Response")}'
+def find_matches(
+    root_path: str,
+    root_relative_path: str,
+    request: str,
+    content_type: str,
+    first_match: bool = False,
+) -> tuple[tuple[Match, ...], NoMatches]:
+    """
+    Returns the matches and no matches of the candidates, in path order.
+    If first_match is True, candidates after the first match are not evaluated.
+    If there are at least config.PARALLEL_MIN_CANDIDATES candidates, they are
+    evaluated by config.PARALLEL_WORKERS processes, see parallel.evaluate.
+    The no matches are diagnosed lazily, i.e. candidates are matched again to
+    describe why they do not match only when the no matches are accessed.
+    """
+    shared_request = Request(request)
+    candidates = store.candidates(root_path, root_relative_path, content_type)
+    matched = None
+    if config.PARALLEL_WORKERS and len(candidates) >= config.PARALLEL_MIN_CANDIDATES:
+        started = timing.start()
+        matched = parallel.evaluate(
+            root_path,
+            root_relative_path,
+            request,
+            content_type,
+            candidates,
+            first_match,
+        )
+        timing.record("match", started)
+    if matched is None:
+        matched = evaluate(
+            root_path,
+            root_relative_path,
+            content_type,
+            candidates,
+            shared_request,
+            first_match,
+        )
+    matches = [create_match(request, candidates[p], groups) for p, groups in matched]
+    if first_match and matched:
+        failed = candidates[: matched[0][0]]
+    else:
+        positions = {p for p, _ in matched}
+        failed = [c for p, c in enumerate(candidates) if p not in positions]
+    evaluate_candidate = None
 
+    def diagnose_candidate(candidate: Candidate) -> Error:
+        nonlocal evaluate_candidate
+        if evaluate_candidate is None:
+            evaluate_candidate = evaluator(
+                root_path, root_relative_path, content_type, candidates, shared_request
+            )
+        with diagnose():
+            return evaluate_candidate(candidate)
 
-def __find(root_path: str, root_relative_path: str, ending: str) -> list[str]:
-    return glob(
-        f"{root_path}/{root_relative_path}/**/*Request.{ending}", recursive=True
+    log.debug("Matches: %s", matches)
+    return tuple(matches), NoMatches(request, failed, diagnose_candidate)
+
+
+def create_match(request: str, candidate: Candidate, result: Groups) -> Match:
+    if candidate.template:
+        return Match(
+            request,
+            candidate.path,
+            candidate.prepared.text,
+            candidate.response_path,
+            "",
+            "",
+            candidate.template,
+            result.groups,
+        )
+    response_raw = __read_response(candidate)
+    started = timing.start()
+    response = render(candidate.response_parts or split(response_raw), result.groups)
+    timing.record("substitution", started)
+    return Match(
+        request,
+        candidate.path,
+        candidate.prepared.text,
+        candidate.response_path,
+        response_raw,
+        response,
     )
 
 
-def __read(path: str) -> str:
-    with open(path, "rt", encoding="utf-8") as f:
-        return f.read()
+def __read_response(candidate: Candidate) -> str:
+    if candidate.response is not None:
+        return candidate.response
+    # Not loaded since it did not exist, which raises FileNotFoundError
+    started = timing.start()
+    with open(candidate.response_path, "rt", encoding="utf-8") as f:
+        response = f.read()
+    timing.record("read", started)
+    return response
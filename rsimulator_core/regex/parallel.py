@@ -0,0 +1,279 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import zlib
+from dataclasses import dataclass, field
+from itertools import count
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from operator import itemgetter
+from threading import Event, Lock, Thread
+from typing import Iterable
+
+import rsimulator_core.regex.config as config
+from rsimulator_core.regex import index, matcher, store
+from rsimulator_core.regex.data import Candidate, Groups, Request
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class __Pending:
+    # The result of each worker of a request, set by __receive
+    results: list
+    remaining: int
+    done: Event = field(default_factory=Event)
+
+
+@dataclass
+class __Pool:
+    pid: int
+    processes: list[BaseProcess]
+    connections: list[Connection]
+    # Serializes the messages sent to each worker
+    locks: list[Lock]
+    # The __Pending of each request in flight, by number
+    pending: dict = field(default_factory=dict)
+    broken: bool = False
+
+
+__pool: __Pool | None = None
+__lock = Lock()
+__numbers = count()
+
+
+def __signature(values: Iterable) -> int:
+    # Tells if the workers found the same candidates, in the same order
+    return zlib.crc32("\n".join(map(str, values)).encode("utf-8"))
+
+
+def __evaluate(
+    partition: int,
+    partitions: int,
+    root_path: str,
+    root_relative_path: str,
+    request: str,
+    content_type: str,
+    first_match: bool,
+    signature: int,
+    partition_signature: int,
+    configuration: tuple,
+) -> list[tuple[int, Groups]] | None:
+    config.set_configuration(content_type, configuration)
+    paths = index.find(root_path, root_relative_path, content_type)
+    if __signature(paths) != signature:
+        return None
+    candidates = tuple(
+        store.load(path, content_type) for path in paths[partition::partitions]
+    )
+    if __signature((c.path, c.signature) for c in candidates) != partition_signature:
+        return None  # Changed since loaded by the parent
+    matched = matcher.evaluate(
+        root_path,
+        root_relative_path,
+        content_type,
+        candidates,
+        Request(request),
+        first_match,
+    )
+    return [(partition + p * partitions, groups) for p, groups in matched]
+
+
+def __serve(connection: Connection, partition: int, partitions: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Stopped by the parent
+    while True:
+        number = None
+        try:
+            number = connection.recv()
+            if number is None:
+                return
+            message = connection.recv()
+            result = __evaluate(partition, partitions, *message)
+        except EOFError:
+            return
+        except Exception:
+            log.exception("Worker %d failed to evaluate candidates", partition)
+            result = None
+        connection.send((number, partition, result))
+
+
+def __receive(pool: __Pool) -> None:
+    # Routes the results of the workers to the pending requests
+    connections = list(pool.connections)
+    while connections:
+        for connection in wait(connections):
+            try:
+                number, partition, result = connection.recv()
+            except (OSError, EOFError):
+                connections.remove(connection)
+                connection.close()
+                with __lock:
+                    pool.broken = True
+                    for pending in pool.pending.values():
+                        pending.done.set()
+                continue
+            with __lock:
+                pending = pool.pending.get(number)
+                if pending:
+                    pending.results[partition] = result
+                    pending.remaining -= 1
+                    if not pending.remaining:
+                        pending.done.set()
+
+
+def __start(workers: int) -> __Pool:
+    context = multiprocessing.get_context("spawn")
+    pool = __Pool(os.getpid(), [], [], [])
+    for partition in range(workers):
+        connection, child_connection = context.Pipe()
+        process = context.Process(
+            target=__serve,
+            args=(child_connection, partition, workers),
+            name=f"rsimulator-matcher-{partition}",
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        pool.processes.append(process)
+        pool.connections.append(connection)
+        pool.locks.append(Lock())
+    Thread(
+        target=__receive, args=(pool,), name="rsimulator-matcher", daemon=True
+    ).start()
+    log.info("Started %d matcher processes", workers)
+    return pool
+
+
+def __stop(pool: __Pool) -> None:
+    for connection, lock in zip(pool.connections, pool.locks):
+        # Not waiting for a worker that is busy, which is terminated below
+        if lock.acquire(timeout=0.1):
+            try:
+                connection.send(None)  # Which stops the worker
+            except OSError:
+                pass
+            finally:
+                lock.release()
+    for process in pool.processes:
+        process.join(1.0)
+        if process.is_alive():
+            process.terminate()
+
+
+def __get_pool() -> __Pool:
+    global __pool
+    with __lock:
+        if __pool and (
+            __pool.pid != os.getpid()
+            or __pool.broken
+            or len(__pool.processes) != config.PARALLEL_WORKERS
+        ):
+            # Forked, i.e. not the parent of the workers, failed or reconfigured
+            if __pool.pid == os.getpid():
+                __stop(__pool)
+            __pool = None
+        if __pool is None:
+            __pool = __start(config.PARALLEL_WORKERS)
+        return __pool
+
+
+def __discard(pool: __Pool) -> None:
+    global __pool
+    with __lock:
+        pool.broken = True
+        for pending in pool.pending.values():
+            pending.done.set()
+        if __pool is pool:
+            __pool = None
+    __stop(pool)
+
+
+def evaluate(
+    root_path: str,
+    root_relative_path: str,
+    request: str,
+    content_type: str,
+    candidates: tuple[Candidate, ...],
+    first_match: bool = False,
+) -> list[tuple[int, Groups]] | None:
+    """
+    Returns the same as matcher.evaluate, but evaluated by a persistent pool of
+    config.PARALLEL_WORKERS processes. Each process evaluates every n:th candidate,
+    which it loads on first request and keeps, so only the request is sent to it.
+    The processes are configured as this one, see config.get_configuration.
+    Returns None, i.e. evaluate serially, if the configuration cannot be sent, e.g.
+    a lambda is registered, or if a process failed, did not answer within
+    config.PARALLEL_TIMEOUT seconds or did not find the same candidates, e.g. since
+    they just changed.
+    """
+    configuration = config.get_configuration(content_type)
+    try:
+        pickle.dumps(configuration)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        log.warning("Evaluating %s serially, see parallel.evaluate", content_type)
+        return None
+    pool = __get_pool()
+    partitions = len(pool.connections)
+    signature = __signature(candidate.path for candidate in candidates)
+    number = next(__numbers)
+    pending = __Pending([None] * partitions, partitions)
+    with __lock:
+        if pool.broken:
+            return None
+        pool.pending[number] = pending
+    try:
+        for partition, (connection, lock) in enumerate(
+            zip(pool.connections, pool.locks)
+        ):
+            partition_signature = __signature(
+                (c.path, c.signature) for c in candidates[partition::partitions]
+            )
+            with lock:
+                connection.send(number)
+                connection.send(
+                    (
+                        root_path,
+                        root_relative_path,
+                        request,
+                        content_type,
+                        first_match,
+                        signature,
+                        partition_signature,
+                        configuration,
+                    )
+                )
+        if not pending.done.wait(config.PARALLEL_TIMEOUT):
+            log.warning("Matcher processes did not answer, restarting them")
+            __discard(pool)
+            return None
+    except OSError:
+        log.exception("Matcher processes failed, restarting them")
+        __discard(pool)
+        return None
+    finally:
+        with __lock:
+            pool.pending.pop(number, None)
+    if pending.remaining or any(result is None for result in pending.results):
+        log.warning("Evaluating %s serially", root_relative_path)
+        return None
+    matched = sorted(
+        (m for result in pending.results for m in result), key=itemgetter(0)
+    )
+    return matched[:1] if first_match else matched
+
+
+def shutdown() -> None:
+    """
+    Stops the processes of evaluate, which are started again when needed.
+    """
+    global __pool
+    with __lock:
+        pool, __pool = __pool, None
+    if pool and pool.pid == os.getpid():
+        __stop(pool)
+
+
+atexit.register(shutdown)
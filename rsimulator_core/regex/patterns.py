@@ -0,0 +1,119 @@
+import re
+from functools import lru_cache
+
+try:
+    from re import _parser as sre_parse  # Python >= 3.11
+except ImportError:
+    import sre_parse
+
+# The max number of compiled patterns that are cached, see configure
+MAXSIZE = 4096
+
+
+def __compile(source: str) -> re.Pattern:
+    return re.compile(f"(?ms){source}")
+
+
+__compile_cached = lru_cache(maxsize=MAXSIZE)(__compile)
+
+
+def configure(maxsize: int | None = MAXSIZE) -> None:
+    """
+    Sets the max number of compiled patterns that are cached, least recently used
+    are evicted first. None means no limit. Clears the cache.
+    """
+    global __compile_cached
+    __compile_cached = lru_cache(maxsize=maxsize)(__compile)
+
+
+def get_pattern(source: str) -> re.Pattern:
+    """
+    Returns source compiled as re.compile(f"(?ms){source}").
+    The compiled pattern is cached and shared by all matchers.
+    """
+    return __compile_cached(source)
+
+
+def fullmatch(source: str, string: str) -> re.Match | None:
+    return __compile_cached(source).fullmatch(string)
+
+
+def info() -> tuple[int, int, int | None, int]:
+    """
+    Returns the functools.lru_cache CacheInfo (hits, misses, maxsize, currsize) of
+    the cache.
+    """
+    return __compile_cached.cache_info()
+
+
+def clear() -> None:
+    __compile_cached.cache_clear()
+
+
+def __flush(run: list[str], literals: list[str]) -> None:
+    if run:
+        literals.append("".join(run))
+        run.clear()
+
+
+def __collect(subpattern, run: list[str], literals: list[str]) -> None:
+    for op, av in subpattern:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+        elif op is sre_parse.SUBPATTERN and not av[1] & sre_parse.SRE_FLAG_IGNORECASE:
+            __collect(av[3], run, literals)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] > 0:
+            # Required at least once, but not adjacent to what is before and after
+            __flush(run, literals)
+            __collect(av[2], run, literals)
+            __flush(run, literals)
+        else:
+            __flush(run, literals)
+
+
+def required_literals(source: str) -> tuple[str, ...]:
+    """
+    Returns substrings that every string fully matched by get_pattern(source) must
+    contain, longest first.
+    Returns () if there are none or if source cannot be parsed.
+    """
+    try:
+        parsed = sre_parse.parse(f"(?ms){source}")
+    except (re.error, RecursionError, OverflowError):
+        return ()
+    if parsed.state.flags & sre_parse.SRE_FLAG_IGNORECASE:
+        return ()
+    run, literals = [], []
+    __collect(parsed, run, literals)
+    __flush(run, literals)
+    return tuple(sorted(set(literals), key=lambda literal: (-len(literal), literal)))
+
+
+def __has_references(av) -> bool:
+    if isinstance(av, sre_parse.SubPattern):
+        return any(
+            op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+            or __has_references(op_av)
+            for op, op_av in av
+        )
+    if isinstance(av, (tuple, list)):
+        return any(__has_references(item) for item in av)
+    return False
+
+
+def combinable(source: str) -> bool:
+    """
+    Returns True if source can be one of many alternatives in a pattern without
+    changing what it matches, i.e. if it is valid and has no global inline flags,
+    e.g. (?s), which are only allowed at the start of the pattern, no named groups
+    and no backreferences.
+    """
+    try:
+        parsed = sre_parse.parse(source)
+    except (re.error, RecursionError, OverflowError):
+        return False
+    return (
+        parsed.state.flags == sre_parse.parse("").state.flags
+        and not parsed.state.groupdict
+        and not __has_references(parsed)
+    )
@@ -0,0 +1,199 @@
+import logging
+import re
+from dataclasses import dataclass
+from os import stat
+from os.path import dirname, sep
+from threading import Lock
+from time import monotonic, perf_counter
+
+import rsimulator_core.regex.config as config
+from rsimulator_core import timing
+from rsimulator_core.regex import index
+from rsimulator_core.regex.config import (
+    get_content_types,
+    get_regex_prefilter_function,
+    get_regex_prepare_function,
+)
+from rsimulator_core.regex.data import Candidate, StoreStats
+from rsimulator_core.template import load as load_template
+from rsimulator_core.template import placeholders, split
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class __Entry:
+    candidate: Candidate
+    signature: tuple[tuple[int, int] | None, ...]
+    checked: float
+
+
+__entries: dict[tuple[str, str], __Entry] = {}
+# The candidate paths last found per root_path, root_relative_path and content_type
+__found: dict[tuple[str, str, str], tuple[str, ...]] = {}
+__lock = Lock()
+__loads = 0
+__load_time = 0.0
+
+
+def __get_response_path(request_path: str) -> str:
+    return f'{dirname(request_path)}/{request_path.split(sep)[-1].replace("Request", "Response")}'
+
+
+def __read(path: str) -> str:
+    started = timing.start()
+    with open(path, "rt", encoding="utf-8") as f:
+        text = f.read()
+    timing.record("read", started)
+    return text
+
+
+def __stat(path: str) -> tuple[int, int] | None:
+    try:
+        s = stat(path)
+        return s.st_mtime_ns, s.st_size
+    except FileNotFoundError:
+        return None
+
+
+def __check_placeholders(candidate: Candidate, numbers: set[int]) -> None:
+    # Logs placeholders without a group and groups without a placeholder
+    try:
+        groups = candidate.prepared.pattern.groups
+    except re.error:
+        return  # Reported when matched
+    if missing := sorted(n for n in numbers if n > groups):
+        log.warning(
+            "Placeholders %s in %s have no group in %s",
+            missing,
+            candidate.response_path,
+            candidate.path,
+        )
+    if unused := [n for n in range(1, groups + 1) if n not in numbers]:
+        log.debug("Groups %s in %s are not used in response", unused, candidate.path)
+
+
+def __load(candidate_path: str, content_type: str, signature: tuple) -> Candidate:
+    global __loads, __load_time
+    start = perf_counter()
+    response_path = __get_response_path(candidate_path)
+    text = __read(candidate_path)
+    started = timing.start()
+    prepared = get_regex_prepare_function(content_type)(text)
+    timing.record("parse", started)
+    streamed = (
+        signature[1] is not None
+        and config.STREAM_RESPONSE_SIZE is not None
+        and signature[1][1] > config.STREAM_RESPONSE_SIZE
+    )
+    # A missing response is reported first when the candidate matches
+    response = __read(response_path) if signature[1] and not streamed else None
+    template = load_template(response_path) if streamed else None
+    response_parts = None if response is None else split(response)
+    candidate = Candidate(
+        candidate_path,
+        prepared,
+        response_path,
+        response,
+        get_regex_prefilter_function(content_type)(prepared),
+        template,
+        response_parts,
+        signature[0],
+    )
+    if template or response_parts:
+        __check_placeholders(
+            candidate,
+            (
+                {p[2] for p in template.parts if p[2]}
+                if template
+                else placeholders(response_parts)
+            ),
+        )
+    elapsed = perf_counter() - start
+    with __lock:
+        __loads += 1
+        __load_time += elapsed
+    log.debug("Loaded candidate %s in %fs", candidate_path, elapsed)
+    return candidate
+
+
+def load(candidate_path: str, content_type: str) -> Candidate:
+    """
+    Returns the candidate, read and prepared by the match function of the
+    content_type.
+    The candidate is kept in memory and is only loaded again if the size or mtime of
+    its request or response file has changed, which is checked at most every
+    config.CHECK_INTERVAL seconds.
+    """
+    key = (candidate_path, content_type)
+    now = monotonic()
+    entry = __entries.get(key)
+    if entry and now - entry.checked < config.CHECK_INTERVAL:
+        return entry.candidate
+    response_path = __get_response_path(candidate_path)
+    signature = (__stat(candidate_path), __stat(response_path))
+    if entry and entry.signature == signature:
+        entry.checked = now
+        return entry.candidate
+    candidate = __load(candidate_path, content_type, signature)
+    with __lock:
+        __entries[key] = __Entry(candidate, signature, now)
+    return candidate
+
+
+def __prune(key: tuple[str, str, str], candidate_paths: tuple[str, ...]) -> None:
+    # Removes the candidates that are no longer found, e.g. since deleted or renamed
+    previous = __found.get(key)
+    if previous is candidate_paths:  # The index is unchanged
+        return
+    with __lock:
+        __found[key] = candidate_paths
+        for path in set(previous or ()).difference(candidate_paths):
+            __entries.pop((path, key[2]), None)
+
+
+def candidates(
+    root_path: str, root_relative_path: str, content_type: str
+) -> tuple[Candidate, ...]:
+    """
+    Returns all candidates recursively found in <root_path>/<root_relative_path>,
+    see index.find. Candidates no longer found are removed from memory.
+    """
+    started = timing.start()
+    candidate_paths = index.find(root_path, root_relative_path, content_type)
+    timing.record("discovery", started)
+    __prune((root_path, root_relative_path, content_type), candidate_paths)
+    return tuple(
+        load(candidate_path, content_type) for candidate_path in candidate_paths
+    )
+
+
+def warm(root_path: str) -> int:
+    """
+    Loads all candidates in root_path and compiles their patterns, e.g. before worker
+    processes are forked so that they share them. Returns the number of candidates.
+    """
+    count = 0
+    for content_type in get_content_types():
+        for candidate in candidates(root_path, "", content_type):
+            try:
+                candidate.prepared.pattern
+            except re.error as e:
+                log.warning("Invalid pattern in %s: %s", candidate.path, e)
+            count += 1
+    log.debug("Warmed %d candidates in %s", count, root_path)
+    return count
+
+
+def stats() -> StoreStats:
+    with __lock:
+        return StoreStats(entries=len(__entries), loads=__loads, load_time=__load_time)
+
+
+def clear() -> None:
+    global __loads, __load_time
+    with __lock:
+        __entries.clear()
+        __found.clear()
+        __loads = 0
+        __load_time = 0.0
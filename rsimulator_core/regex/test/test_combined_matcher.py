@@ -0,0 +1,48 @@
+from posixpath import dirname
+
+import pytest
+from rsimulator_core.regex import config, find_matches, find_matches_combined
+
+root_dir = f"{dirname(__file__)}/data"
+
+
+@pytest.mark.parametrize(
+    "request_",
+    [
+        "This\nis\nthe\nrequest",
+        "Harald Ljungstroem says hello!",
+        "No candidate matches",
+    ],
+)
+def test_find_matches(request_, monkeypatch):
+    monkeypatch.setattr(config, "PREFILTER", False)
+    assert find_matches_combined(root_dir, "txt", request_, "txt") == find_matches(
+        root_dir, "txt", request_, "txt"
+    )
+
+
+def test_find_matches_not_combinable(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PREFILTER", False)
+    for name, request_, response in (
+        ("1", "(?P<name>a+)", "${1}"),
+        ("2", "(a+)", "2 ${1}"),
+        ("3", "(a)\\1", "3 ${1}"),
+        ("4", "(?i)A+", "4"),
+        ("5", "b", "5"),
+        ("6", "(?s)(a).*", "6 ${1}"),
+    ):
+        (tmp_path / f"{name}_Request.txt").write_text(request_)
+        (tmp_path / f"{name}_Response.txt").write_text(response)
+
+    for request_ in "aa", "AA", "b", "c":
+        for first_match in False, True:
+            assert find_matches_combined(
+                str(tmp_path), "", request_, "txt", first_match
+            ) == find_matches(str(tmp_path), "", request_, "txt", first_match)
+
+    matches, no_matches = find_matches_combined(str(tmp_path), "", "aa", "txt")
+    assert [m.response for m in matches] == ["aa", "2 aa", "3 a", "4", "6 a"]
+    assert len(no_matches) == 1
+    matches, no_matches = find_matches_combined(str(tmp_path), "", "aa", "txt", True)
+    assert [m.response for m in matches] == ["aa"]
+    assert len(no_matches) == 0
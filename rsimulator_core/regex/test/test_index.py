@@ -0,0 +1,87 @@
+from rsimulator_core.regex import config, index
+
+
+def test_find(tmp_path):
+    index.clear()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "1_Request.json").write_text("")
+    (tmp_path / "a" / "1_Response.json").write_text("")
+    (tmp_path / "b" / "c").mkdir(parents=True)
+    (tmp_path / "b" / "c" / "2_Request.json").write_text("")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "3_Request.json").write_text("")
+    (tmp_path / "4_Request.txt").write_text("")
+
+    assert index.find(str(tmp_path), "", "json") == (
+        f"{tmp_path}/a/1_Request.json",
+        f"{tmp_path}/b/c/2_Request.json",
+    )
+    assert index.find(str(tmp_path), "b", "json") == (f"{tmp_path}/b/c/2_Request.json",)
+    assert index.find(str(tmp_path), "", "txt") == (f"{tmp_path}/4_Request.txt",)
+    assert index.find(str(tmp_path), "missing", "json") == ()
+    # Nothing is kept for a missing path
+    assert index.stats().keys == 3
+
+
+def test_find_unreadable(tmp_path, monkeypatch):
+    index.clear()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "1_Request.json").write_text("")
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "2_Request.json").write_text("")
+    scandir = index.scandir
+
+    def denied(path):
+        if path == f"{tmp_path}/a":
+            raise PermissionError(path)
+        return scandir(path)
+
+    monkeypatch.setattr(index, "scandir", denied)
+
+    # Skipped, as by glob
+    assert index.find(str(tmp_path), "", "json") == (f"{tmp_path}/b/2_Request.json",)
+
+
+def test_find_updated(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 0.0)
+    index.clear()
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "1_Request.json").write_text("")
+
+    assert index.find(str(tmp_path), "", "json") == (f"{tmp_path}/a/1_Request.json",)
+    assert index.stats().rebuilds == 1
+
+    # Unchanged directories are not rescanned
+    assert index.find(str(tmp_path), "", "json") == (f"{tmp_path}/a/1_Request.json",)
+    assert index.stats().rebuilds == 1
+
+    (tmp_path / "a" / "b").mkdir()
+    (tmp_path / "a" / "b" / "2_Request.json").write_text("")
+    assert index.find(str(tmp_path), "", "json") == (
+        f"{tmp_path}/a/1_Request.json",
+        f"{tmp_path}/a/b/2_Request.json",
+    )
+
+    (tmp_path / "a" / "1_Request.json").unlink()
+    assert index.find(str(tmp_path), "", "json") == (f"{tmp_path}/a/b/2_Request.json",)
+
+    (tmp_path / "a" / "b" / "2_Request.json").unlink()
+    (tmp_path / "a" / "b").rmdir()
+    assert index.find(str(tmp_path), "", "json") == ()
+
+    stats = index.stats()
+    assert (stats.keys, stats.directories, stats.entries, stats.rebuilds) == (
+        1,
+        2,
+        0,
+        4,
+    )
+
+
+def test_find_check_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 3600.0)
+    index.clear()
+
+    assert index.find(str(tmp_path), "", "json") == ()
+    (tmp_path / "1_Request.json").write_text("")
+    assert index.find(str(tmp_path), "", "json") == ()
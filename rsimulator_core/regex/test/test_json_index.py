@@ -0,0 +1,57 @@
+from rsimulator_core.data import Error
+from rsimulator_core.regex import json_index
+from rsimulator_core.regex.data import Request
+from rsimulator_core.regex.diagnostics import NOT_DIAGNOSED, diagnose
+from rsimulator_core.regex.store import candidates
+
+
+def test_reject(tmp_path):
+    json_index.clear()
+    for name, request in (
+        ("1", '{"operation": "create", "id": "(.*)"}'),
+        ("2", '{"operation": "delete", "id": "(.*)"}'),
+        ("3", '{"operation": "(.*)", "id": "(.*)"}'),
+        ("4", '{"customer": {"id": 1}}'),
+    ):
+        (tmp_path / f"{name}_Request.json").write_text(request)
+        (tmp_path / f"{name}_Response.json").write_text("{}")
+    found = candidates(str(tmp_path), "", "json")
+
+    rejected = json_index.reject(
+        str(tmp_path), "", found, Request('{"operation": "create", "id": "x"}')
+    )
+    assert [c.path for c in rejected] == [found[1].path, found[3].path]
+    assert rejected[found[1]] == Error(
+        path=("operation",),
+        this="delete",
+        that="create",
+        message='Rejected by index, values not matching: "delete" != "create"',
+    )
+    assert rejected[found[3]] == Error(
+        path=("customer", "id"),
+        this="1",
+        that=None,
+        message='Rejected by index, values not matching: "1" != "None"',
+    )
+
+    # Errors are only built when diagnosing
+    with diagnose(False):
+        rejected = json_index.reject(
+            str(tmp_path), "", found, Request('{"operation": "create", "id": "x"}')
+        )
+    assert rejected == {found[1]: NOT_DIAGNOSED, found[3]: NOT_DIAGNOSED}
+
+    # Not rejected if the value is found elsewhere in the request
+    rejected = json_index.reject(
+        str(tmp_path), "", found, Request('{"operation": "create", "id": "delete"}')
+    )
+    assert [c.path for c in rejected] == [found[3].path]
+
+    # But if it is only part of another value
+    rejected = json_index.reject(
+        str(tmp_path), "", found, Request('{"operation": "create", "id": "undelete"}')
+    )
+    assert [c.path for c in rejected] == [found[1].path, found[3].path]
+
+    # Nothing rejected if the request cannot be loaded
+    assert json_index.reject(str(tmp_path), "", found, Request("{")) == {}
@@ -1,7 +1,7 @@
 import pytest
 from rsimulator_core.data import Error
-from rsimulator_core.regex.data import Groups
-from rsimulator_core.regex.json_matcher import match
+from rsimulator_core.regex.data import Groups, Request
+from rsimulator_core.regex.json_matcher import literals, match, prefilter, prepare
 
 
 @pytest.mark.parametrize(
@@ -262,3 +262,115 @@ def test_different_length_of_lists(this, that, expected):
 )
 def test_error_within_lists(this, that, expected):
     assert match(this, that) == expected
+
+
+@pytest.mark.parametrize(
+    "this, that, expected",
+    [
+        (
+            '{"c":"([a-z_]+)", "a": 1, "d": {"e": "^(e)_(v.+$)", "f": {"g": 1}}, "b":false}',
+            '{"a": 1, "b":false, "c":"c_value", "d": {"e": "e_value", "f": {"g": 1}}}',
+            None,
+        ),
+        (
+            '{"a": (1), "b":(false), (.*)}',
+            '{"a": 1, "b":false, "c":"c_value", "d": {"e": "e_value", "f": {"g": 1}}}',
+            None,
+        ),
+        ('"(h)ell(o)"', '"hello"', None),
+        (
+            '{"operation": "create", "id": "(.*)"}',
+            '{"operation": "delete", "id": "1"}',
+            Error(
+                path=("operation",),
+                this="create",
+                that="delete",
+                message='Rejected by prefilter, "create" not found',
+            ),
+        ),
+        (
+            '{"p1": {"p2": 1}}',
+            '{"p1": {"p2": 2}}',
+            Error(
+                path=("p1", "p2"),
+                this="1",
+                that="2",
+                message='Rejected by prefilter, values not matching: "1" != "2"',
+            ),
+        ),
+        (
+            '{"p1": {"p2": "a"}}',
+            '{"p1": {"p": "a"}}',
+            Error(
+                path=("p1",),
+                this="p2",
+                that=None,
+                message='Rejected by prefilter, keys not matching: "p2"',
+            ),
+        ),
+        (
+            '{"foo": "fooValue"}',
+            "foo: fooValue",
+            Error(
+                path=(),
+                this='{"foo": "fooValue"}',
+                that="foo: fooValue",
+                message='Cannot load that "foo: fooValue": Expecting value: '
+                "line 1 column 1 (char 0)",
+            ),
+        ),
+        # The regexp as a whole may match
+        ('\\["(hello)", "(world)"\\]', '["hello", "world"]', None),
+    ],
+)
+def test_prefilter(this, that, expected):
+    assert prefilter(prepare(this))(Request(that)) == expected
+    if expected:
+        assert isinstance(match(this, that), Error)
+
+
+@pytest.mark.parametrize(
+    "this, expected",
+    [
+        (
+            '{"operation": "create", "id": "(.*)", "data": {"count": 1, "ok": true}}',
+            (
+                (("operation",), "create", "create"),
+                (("data", "count"), 1, "1"),
+                (("data", "ok"), True, "true"),
+            ),
+        ),
+        # Not literal values
+        ('{"a": "a.b", "b": 1.5, "c": null, "d": ["a"], "e": "a b"}', ()),
+        # Not required, since the alternation may match the whole candidate
+        ('{"a": "create", "b": "x|y"}', ()),
+        ('["create"]', ()),
+        ("{", ()),
+    ],
+)
+def test_literals(this, expected):
+    assert literals(prepare(this)) == expected
+
+
+def test_match_request():
+    request = Request('{"a": "x", "b": ["y"]}')
+    assert match('{"b": ["y"], "a": "(.*)"}', request) == Groups(groups=("x",))
+    that_object, _ = request.get("json", None)
+    forms = request.get("json.forms", None)
+    assert forms.canonicals
+    assert match('{"b": ["(.*)"], "a": "x"}', request) == Groups(groups=("y",))
+    # Loaded and canonicalized once
+    assert request.get("json", None)[0] is that_object
+    assert request.get("json.forms", None) is forms
+
+
+def test_match_canonicals():
+    prepared = prepare('{"b": [{"d": 2, "c": "(.*)"}, 1], "a": {"f": [3, "ö"]}}')
+    request = Request('{"a": {"f": [3, "ö"]}, "b": [{"c": "x", "d": 2}, 1]}')
+    assert match(prepared, request) == Groups(groups=("x",))
+    # The canonical forms are memoized, also for the nested objects
+    canonicals = dict(prepared.forms.canonicals)
+    assert id(prepared.value) in canonicals
+    assert id(prepared.value["b"]) in canonicals
+    assert match(prepared, request) == Groups(groups=("x",))
+    assert prepared.forms.canonicals == canonicals
@@ -1,7 +1,9 @@
 from posixpath import dirname
 
 from rsimulator_core.data import Error, Match, NoMatch
-from rsimulator_core.regex import find_matches
+from rsimulator_core.regex import config, find_matches, matcher
+from rsimulator_core.regex.config import get_regex_match_function
+from rsimulator_core.regex.diagnostics import NOT_DIAGNOSED
 
 root_dir = f"{dirname(__file__)}/data"
 
@@ -84,9 +86,7 @@ def test_find_matches_txt():
                     path=(),
                     this="([a-zA-Z]{6}) ([^ ]+) says hello!",
                     that="This\nis\nthe\nrequest",
-                    message="Values not matching: "
-                    "([a-zA-Z]{6}) ([^ ]+) says hello! != "
-                    "This\nis\nthe\nrequest",
+                    message='Rejected by prefilter, " says hello!" not found',
                 ),
             ),
         ),
@@ -111,8 +111,7 @@ def test_find_matches_txt():
                     path=(),
                     this="(This.*)",
                     that="Harald Ljungstroem says hello!",
-                    message="Values not matching: (This.*) != "
-                    "Harald Ljungstroem says hello!",
+                    message='Rejected by prefilter, "This" not found',
                 ),
             ),
         ),
@@ -154,3 +153,45 @@ def test_find_matches_xml():
         ),
         (),
     )
+
+
+def test_find_matches_first_match():
+    request = "Thisis Ljungstroem says hello!"
+    matches, no_matches = find_matches(root_dir, "txt", request, "txt")
+    assert [m.candidate_path for m in matches] == [
+        f"{root_dir}/txt/1_Request.txt",
+        f"{root_dir}/txt/2_Request.txt",
+    ]
+    assert no_matches == ()
+
+    matches, no_matches = find_matches(root_dir, "txt", request, "txt", True)
+    assert [m.candidate_path for m in matches] == [f"{root_dir}/txt/1_Request.txt"]
+    assert no_matches == ()
+
+    matches, no_matches = find_matches(
+        root_dir, "txt", "Harald Ljungstroem says hello!", "txt", True
+    )
+    assert [m.candidate_path for m in matches] == [f"{root_dir}/txt/2_Request.txt"]
+    assert [n.candidate_path for n in no_matches] == [f"{root_dir}/txt/1_Request.txt"]
+
+
+def test_find_matches_lazy_no_matches(monkeypatch):
+    errors = []
+    match = get_regex_match_function("txt")
+
+    def spy(this, that):
+        result = match(this, that)
+        errors.append(result)
+        return result
+
+    monkeypatch.setattr(matcher, "get_regex_match_function", lambda content_type: spy)
+    monkeypatch.setattr(config, "PREFILTER", False)
+    matches, no_matches = find_matches(root_dir, "txt", "no match", "txt")
+    assert len(no_matches) == 2
+    assert errors == [NOT_DIAGNOSED, NOT_DIAGNOSED]
+
+    # Diagnosed when accessed
+    assert no_matches[1].error.message.startswith("Values not matching")
+    assert len(errors) == 4
+    assert no_matches[0].error.message.startswith("Values not matching")
+    assert len(errors) == 4
@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+import pytest
+from rsimulator_core.regex import config, find_matches, parallel, store, txt_matcher
+from rsimulator_core.regex.data import Groups
+
+candidates = {
+    "json": ('{"foo": "(.*)"}', '{"bar": "(.*)"}', '{"foo": "Hello"}'),
+    "txt": ("(Hello.*)", "(Bye.*)", "Hello"),
+}
+xml = (
+    '<{0}:order xmlns:{0}="urn:order">'
+    "<{0}:id>{1}</{0}:id><{0}:item>{2}</{0}:item>"
+    "</{0}:order>"
+)
+
+
+@pytest.fixture(autouse=True)
+def workers(monkeypatch):
+    monkeypatch.setattr(config, "PARALLEL_WORKERS", 3)
+    monkeypatch.setattr(config, "PARALLEL_MIN_CANDIDATES", 1)
+    yield
+    parallel.shutdown()
+
+
+def write(root_path, content_type, count):
+    # Every third candidate does not match the request
+    matching, not_matching, request = candidates[content_type]
+    for i in range(count):
+        with open(f"{root_path}/{i:02d}_Request.{content_type}", "wt") as f:
+            f.write(not_matching if i % 3 == 1 else matching)
+        with open(f"{root_path}/{i:02d}_Response.{content_type}", "wt") as f:
+            f.write(f"{i} ${{1}}")
+    return request
+
+
+@pytest.mark.parametrize("content_type", ["json", "txt"])
+@pytest.mark.parametrize("first_match", [False, True])
+def test_find_matches_parallel(tmp_path, monkeypatch, content_type, first_match):
+    request = write(tmp_path, content_type, 10)
+    matches, no_matches = find_matches(
+        str(tmp_path), "", request, content_type, first_match
+    )
+
+    monkeypatch.setattr(config, "PARALLEL_WORKERS", 0)
+    assert (matches, no_matches) == find_matches(
+        str(tmp_path), "", request, content_type, first_match
+    )
+    assert [m.response.split()[0] for m in matches] == (
+        ["0"] if first_match else ["0", "2", "3", "5", "6", "8", "9"]
+    )
+    assert len(no_matches) == (0 if first_match else 3)
+
+
+def slow_match(this, that):
+    sleep(2.0)
+    return txt_matcher.match(this, that)
+
+
+def test_find_matches_parallel_xml(tmp_path):
+    for i in range(10):
+        with open(f"{tmp_path}/{i:02d}_Request.xml", "wt") as f:
+            f.write(xml.format("ns", i, "(.*)"))
+        with open(f"{tmp_path}/{i:02d}_Response.xml", "wt") as f:
+            f.write("<item>${1}</item>")
+    request = f'<?xml version="1.0"?>\n{xml.format("o", 9, "Hello")}'
+
+    matches, no_matches = find_matches(str(tmp_path), "", request, "xml")
+
+    assert [(m.candidate_path[-14:], m.response) for m in matches] == [
+        ("09_Request.xml", "<item>Hello</item>")
+    ]
+    assert len(no_matches) == 9
+
+
+def test_evaluate_changed(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 0.0)
+    request = write(tmp_path, "json", 3)
+    loaded = store.candidates(str(tmp_path), "", "json")
+    assert parallel.evaluate(str(tmp_path), "", request, "json", loaded) == [
+        (0, Groups(("Hello",))),
+        (2, Groups(("Hello",))),
+    ]
+
+    # The workers did not find the same candidates, so they are not used
+    assert parallel.evaluate(str(tmp_path), "", request, "json", loaded[1:]) is None
+
+    # Nor if a candidate changed since loaded
+    with open(f"{tmp_path}/00_Request.json", "wt") as f:
+        f.write('{"foo": "(Hel.*)"}')
+    assert parallel.evaluate(str(tmp_path), "", request, "json", loaded) is None
+
+
+def test_evaluate_concurrently(tmp_path):
+    request = write(tmp_path, "txt", 6)
+    loaded = store.candidates(str(tmp_path), "", "txt")
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(
+            executor.map(
+                lambda _: parallel.evaluate(str(tmp_path), "", request, "txt", loaded),
+                range(8),
+            )
+        )
+
+    assert results == [[(p, Groups(("Hello",))) for p in (0, 2, 3, 5)]] * 8
+
+
+def test_evaluate_configuration(tmp_path, monkeypatch):
+    request = write(tmp_path, "txt", 3)
+    loaded = store.candidates(str(tmp_path), "", "txt")
+
+    # The workers match as configured here, and are restarted if they do not answer
+    monkeypatch.setattr(config, "PARALLEL_TIMEOUT", 0.5)
+    monkeypatch.setitem(config.__regex_match_functions, "txt", slow_match)
+    assert parallel.evaluate(str(tmp_path), "", request, "txt", loaded) is None
+
+    # A function that cannot be sent to the workers is evaluated serially
+    monkeypatch.setitem(config.__regex_match_functions, "txt", lambda *args: None)
+    assert parallel.evaluate(str(tmp_path), "", request, "txt", loaded) is None
+
+    monkeypatch.undo()
+    monkeypatch.setattr(config, "PARALLEL_WORKERS", 3)
+    assert len(parallel.evaluate(str(tmp_path), "", request, "txt", loaded)) == 2
+
+
+def test_find_matches_min_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PARALLEL_MIN_CANDIDATES", 4)
+    monkeypatch.setattr(parallel, "evaluate", None)
+    request = write(tmp_path, "json", 3)
+
+    assert len(find_matches(str(tmp_path), "", request, "json")[0]) == 2
@@ -0,0 +1,34 @@
+from rsimulator_core.regex import patterns
+
+
+def test_fullmatch():
+    patterns.clear()
+
+    assert patterns.fullmatch("(a).(c)", "a\nc").groups() == ("a", "c")
+    assert patterns.fullmatch("(a).(c)", "abcd") is None
+    assert patterns.get_pattern("(a).(c)") is patterns.get_pattern("(a).(c)")
+
+    hits, misses, _, currsize = patterns.info()
+    assert (hits, misses, currsize) == (3, 1, 1)
+
+
+def test_configure():
+    patterns.configure(2)
+    try:
+        for source in "a", "b", "a", "c", "b":
+            patterns.get_pattern(source)
+
+        # b is evicted since least recently used when c is added
+        hits, misses, maxsize, currsize = patterns.info()
+        assert (hits, misses, maxsize, currsize) == (1, 4, 2, 2)
+    finally:
+        patterns.configure()
+
+
+def test_combinable():
+    assert patterns.combinable("(a+).(?i:b)")
+    assert not patterns.combinable("(?s)hello.*")
+    assert not patterns.combinable("(?ms)a")
+    assert not patterns.combinable("(?P<name>a)")
+    assert not patterns.combinable("(a)\\1")
+    assert not patterns.combinable("(")
@@ -0,0 +1,112 @@
+import logging
+from os import utime
+
+from rsimulator_core.regex import config, store
+from rsimulator_core.regex.data import Groups
+from rsimulator_core.regex.json_matcher import match
+
+
+def test_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 0.0)
+    store.clear()
+    request_path = tmp_path / "1_Request.json"
+    response_path = tmp_path / "1_Response.json"
+    request_path.write_text('{"foo": "(.*)"}')
+    response_path.write_text('{"bar": "${1}"}')
+
+    candidate = store.load(str(request_path), "json")
+    assert candidate.path == str(request_path)
+    assert candidate.prepared.text == '{"foo": "(.*)"}'
+    assert candidate.prepared.value == {"foo": "(.*)"}
+    assert candidate.response_path == str(response_path)
+    assert candidate.response == '{"bar": "${1}"}'
+    assert match(candidate.prepared, '{"foo": "x"}') == Groups(groups=("x",))
+
+    # Not loaded again if unchanged
+    assert store.load(str(request_path), "json") is candidate
+    assert store.stats().loads == 1
+
+    # Loaded again if changed
+    response_path.write_text('{"bar": "${1}", "baz": 1}')
+    utime(response_path, ns=(0, 0))
+    changed = store.load(str(request_path), "json")
+    assert changed is not candidate
+    assert changed.response == '{"bar": "${1}", "baz": 1}'
+    assert store.stats().loads == 2
+
+
+def test_load_missing_response(tmp_path):
+    store.clear()
+    request_path = tmp_path / "1_Request.txt"
+    request_path.write_text("(.*)")
+
+    candidate = store.load(str(request_path), "txt")
+    assert candidate.response is None
+
+
+def test_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 3600.0)
+    store.clear()
+    (tmp_path / "1_Request.txt").write_text("a")
+    (tmp_path / "2_Request.txt").write_text("b")
+
+    candidates = store.candidates(str(tmp_path), "", "txt")
+    assert [c.prepared.text for c in candidates] == ["a", "b"]
+
+    # No file system access within the check interval
+    (tmp_path / "1_Request.txt").write_text("c")
+    assert store.candidates(str(tmp_path), "", "txt") == candidates
+
+
+def test_candidates_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHECK_INTERVAL", 0.0)
+    store.clear()
+    (tmp_path / "1_Request.txt").write_text("a")
+    (tmp_path / "2_Request.txt").write_text("b")
+    assert len(store.candidates(str(tmp_path), "", "txt")) == 2
+    assert store.stats().entries == 2
+
+    (tmp_path / "2_Request.txt").rename(tmp_path / "3_Request.txt")
+    (tmp_path / "1_Request.txt").unlink()
+
+    assert [c.prepared.text for c in store.candidates(str(tmp_path), "", "txt")] == [
+        "b"
+    ]
+    assert store.stats().entries == 1
+
+
+def test_warm(tmp_path):
+    store.clear()
+    (tmp_path / "1_Request.txt").write_text("a")
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "1_Request.json").write_text('{"b": "(.*)"}')
+    (tmp_path / "b" / "2_Request.xml").write_text("<b>(.*)</b>")
+
+    assert store.warm(str(tmp_path)) == 3
+    assert store.stats().loads == 3
+    assert store.candidates(str(tmp_path), "b", "json")[0].prepared.pattern
+    assert store.stats().loads == 3
+
+
+def test_load_stream_response(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STREAM_RESPONSE_SIZE", 2)
+    store.clear()
+    (tmp_path / "1_Request.txt").write_text("a")
+    (tmp_path / "1_Response.txt").write_text("b${1}")
+
+    candidate = store.load(str(tmp_path / "1_Request.txt"), "txt")
+    assert candidate.response is None
+    assert candidate.template.path == str(tmp_path / "1_Response.txt")
+    assert b"".join(candidate.template.chunks(("c",))) == b"bc"
+
+
+def test_load_response_parts(tmp_path, caplog):
+    caplog.set_level(logging.DEBUG)
+    store.clear()
+    (tmp_path / "1_Request.txt").write_text("(a)(b)")
+    (tmp_path / "1_Response.txt").write_text("${1}${3}")
+
+    candidate = store.load(str(tmp_path / "1_Request.txt"), "txt")
+    assert candidate.response_parts == ("", 1, "", 3, "")
+    assert "Placeholders [3]" in caplog.text
+    assert "Groups [2]" in caplog.text
@@ -1,7 +1,7 @@
 import pytest
 from rsimulator_core.data import Error
-from rsimulator_core.regex.data import Groups
-from rsimulator_core.regex.txt_matcher import match
+from rsimulator_core.regex.data import Groups, Request
+from rsimulator_core.regex.txt_matcher import match, prefilter, prepare
 
 
 @pytest.mark.parametrize(
@@ -35,3 +35,27 @@ def test_match(this, that, expected):
 )
 def test_error(this, that, expected):
     assert match(this, that) == expected
+
+
+@pytest.mark.parametrize(
+    "this, that, expected",
+    [
+        ("We are ([a-zA-z]+) and (.*)", "We are Foo and Bar", None),
+        ("We are (.*)", "You are Foo", 'Rejected by prefilter, "We are " not found'),
+        ("a|b", "c", None),
+    ],
+)
+def test_prefilter(this, that, expected):
+    error = prefilter(prepare(this))(Request(that))
+    assert (error.message if error else None) == expected
+    if error:
+        assert isinstance(match(this, that), Error)
+
+
+def test_match_request():
+    request = Request(" Hello World! ")
+    assert match("Hello (.*)!", request) == Groups(groups=("World",))
+    assert match("(.*) World!", request) == Groups(groups=("Hello",))
+    assert match("Hello", request) == Error(
+        (), "Hello", " Hello World! ", "Values not matching: Hello !=  Hello World! "
+    )
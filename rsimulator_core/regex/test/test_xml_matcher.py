@@ -1,8 +1,7 @@
 import pytest
 from rsimulator_core.data import Error
-from rsimulator_core.regex.data import Groups
-from rsimulator_core.regex.xml_matcher import match
-
+from rsimulator_core.regex.data import Groups, Request
+from rsimulator_core.regex.xml_matcher import match, prefilter, prepare
 
 
 @pytest.mark.parametrize(
@@ -303,3 +302,89 @@ def test_match_soap_example():
     assert match(this, that) == Groups(
         groups=("a", "Test3", "Simulator", "<n2:bar><n2:baz>baz</n2:baz></n2:bar>"),
     )
+
+
+@pytest.mark.parametrize(
+    "this, that, expected",
+    [
+        (
+            '<x x1=".*" x2="([\\w]+)"><y y="([a-z0-9]{1})">y</y><z z="z">(.*)</z></x>',
+            '<x x2="x2" x1="x1"><y y="y">y</y><z z="z">z</z></x>',
+            None,
+        ),
+        ("<x>(.*)</x>", "<x><y><z>z</z></y></x>", None),
+        (
+            "<x><operation>create</operation><id>(.*)</id></x>",
+            "<x><operation>delete</operation><id>1</id></x>",
+            Error(
+                path=("x",),
+                this="<operation>create</operation>",
+                that="<operation>delete</operation>",
+                message='Rejected by prefilter, "create" not found in text',
+            ),
+        ),
+        (
+            '<x y="1">(.*)</x>',
+            '<x y="2">a</x>',
+            Error(
+                path=(),
+                this='<x y="1">(.*)</x>',
+                that='<x y="2">a</x>',
+                message='Rejected by prefilter, "1" not found in attribute y',
+            ),
+        ),
+        (
+            "<x>(.*)</x>",
+            "<a>b</a>",
+            Error(
+                path=(),
+                this="<x>(.*)</x>",
+                that="<a>b</a>",
+                message='Rejected by prefilter, names not matching: "x" != "a"',
+            ),
+        ),
+        (
+            "<x/>",
+            "<x>",
+            Error(
+                path=(),
+                this="<x/>",
+                that="<x>",
+                message=(
+                    'Cannot parse "that": "<x>", Premature end of data in tag x line 1, '
+                    "line 1, column 4 (<string>, line 1)"
+                ),
+            ),
+        ),
+    ],
+)
+def test_prefilter(this, that, expected):
+    assert prefilter(prepare(this))(Request(that)) == expected
+    if expected:
+        assert isinstance(match(this, that), Error)
+
+
+def test_match_request():
+    request = Request('<x><y b="2" a="1">z</y></x>')
+    assert match('<x><y a="1" b="2">(.*)</y></x>', request) == Groups(groups=("z",))
+    that_element, _ = request.get("xml", None)
+    canonicals = request.get("xml.canonicals", None)
+    assert canonicals
+    assert match('<x><y a="(.*)" b="2">z</y></x>', request) == Groups(groups=("1",))
+    # Parsed and canonicalized once
+    assert request.get("xml", None)[0] is that_element
+    assert request.get("xml.canonicals", None) is canonicals
+
+
+def test_prepare_elements():
+    prepared = prepare('<x a="1"><y>(.*)</y><!-- c --><z/></x>')
+    # Canonicalized when prepared, for all elements
+    assert len(prepared.forms) == 3
+    elements = dict(prepared.forms)
+    assert match(prepared, '<x a="1"><y>a</y><!-- c --><z/></x>') == Groups(
+        groups=("a",)
+    )
+    assert match(prepared, '<x a="1"><y>b</y><z/><!-- c --></x>') == Groups(
+        groups=("b",)
+    )
+    assert prepared.forms == elements
@@ -1,19 +1,65 @@
 import logging
-import re
+from typing import Callable
 
 from rsimulator_core.data import Error
-from rsimulator_core.regex.data import Groups
+from rsimulator_core.regex.data import Groups, Prepared, Request
+from rsimulator_core.regex.diagnostics import NOT_DIAGNOSED, diagnosing
+from rsimulator_core.regex.patterns import required_literals
 
 log = logging.getLogger(__name__)
 
 
-def match(this: str, that: str) -> Error | Groups:
+def prepare(this: str) -> Prepared:
+    """
+    Prepares this, i.e. a candidate, to be matched by match.
+    """
+    return Prepared(this, this.strip())
+
+
+def match(this: str | Prepared, that: str | Request) -> Error | Groups:
     """
     Matches this and that.
-    The "this" can contain regular expressions.
+    The "this" can contain regular expressions, and can be prepared by prepare.
+    The "that" can be a Request, to strip it only once when matched with many
+    candidates.
     Returns an Error or a Groups object.
     """
-    if m := re.fullmatch(rf"(?ms){this.strip()}", that.strip()):
+    prepared = this if isinstance(this, Prepared) else prepare(this)
+    request = that if isinstance(that, Request) else Request(that)
+    that = request.text
+    if m := prepared.pattern.fullmatch(request.get("txt", str.strip)):
         return Groups(groups=tuple(m.groups()))
     else:
-        return Error((), this, that, f"Values not matching: {this} != {that}")
+        return mismatch(prepared.text, that)
+
+
+def mismatch(this: str, that: str) -> Error:
+    """
+    Returns the Error of match if this and that do not match.
+    """
+    if not diagnosing():
+        return NOT_DIAGNOSED
+    return Error((), this, that, f"Values not matching: {this} != {that}")
+
+
+def prefilter(prepared: Prepared) -> Callable[[Request], Error | None]:
+    """
+    Returns a function that cheaply returns an Error if the prepared candidate cannot
+    match a request, else None.
+    """
+    literals = required_literals(prepared.source)
+
+    def reject(request: Request) -> Error | None:
+        for literal in literals:
+            if literal not in request.text:
+                if not diagnosing():
+                    return NOT_DIAGNOSED
+                return Error(
+                    (),
+                    prepared.text,
+                    request.text,
+                    f'Rejected by prefilter, "{literal}" not found',
+                )
+        return None
+
+    return reject
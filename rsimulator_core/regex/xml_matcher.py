@@ -1,10 +1,14 @@
+from dataclasses import dataclass
 from re import Match as ReMatch
-from re import fullmatch, sub
+from re import sub
+from typing import Any, Callable
 
 from lxml import etree as et
 from lxml.etree import Element, XMLSyntaxError
 from rsimulator_core.data import Error
-from rsimulator_core.regex.data import Groups
+from rsimulator_core.regex.data import Groups, Prepared, Request
+from rsimulator_core.regex.diagnostics import NOT_DIAGNOSED, diagnosing
+from rsimulator_core.regex.patterns import fullmatch, required_literals
 
 
 def __error(
@@ -13,6 +17,8 @@ def __error(
     that_element: Element,
     message: str,
 ) -> Error:
+    if not diagnosing():
+        return NOT_DIAGNOSED
     path = tuple(e.tag for e in parents)
     this = (
         this_element
@@ -34,35 +40,80 @@ def __remove_prolog(xml_str: str) -> str:
 
 
 def __match(this_str: str, that_str: str) -> ReMatch[str]:
-    return fullmatch(f"(?ms){this_str}", that_str)
+    return fullmatch(this_str, that_str)
+
+
+@dataclass(frozen=True)
+class __Element:
+    # A candidate element as matched, see __prepare_element
+    tag: Any
+    attrib: dict[str, str]
+    text: str
+    canonical: str
+
+
+def __canonicalize_element(element: Element) -> str:
+    return et.canonicalize(element, strip_text=True, rewrite_prefixes=True)
+
+
+def __prepare_element(element: Element) -> __Element:
+    return __Element(
+        element.tag,
+        dict(element.attrib),
+        element.text.strip() if element.text else "",
+        __canonicalize_element(element),
+    )
+
+
+def __get_element(
+    this_element: Element, elements: dict[Element, __Element]
+) -> __Element:
+    # The elements of a candidate are prepared when it is prepared
+    if this_element not in elements:
+        elements[this_element] = __prepare_element(this_element)
+    return elements[this_element]
+
+
+def __canonicalize_that(that_element: Element, canonicals: dict[Element, str]) -> str:
+    # The canonicalized elements of a request are kept in canonicals
+    if that_element not in canonicals:
+        canonicals[that_element] = __canonicalize_element(that_element)
+    return canonicals[that_element]
 
 
 def __match_tag(
-    this_element: Element, that_element: Element, parents: tuple[Element, ...]
+    this: __Element,
+    this_element: Element,
+    that_element: Element,
+    parents: tuple[Element, ...],
 ) -> Error | Groups:
-    if this_element.tag == that_element.tag:
+    if this.tag == that_element.tag:
         return Groups()
     return __error(
         parents,
         this_element,
         that_element,
-        f'Names not matching: "{this_element.tag}" != "{that_element.tag}"',
+        f'Names not matching: "{this.tag}" != "{that_element.tag}"',
     )
 
 
 def __match_attr(
-    this_element: Element, that_element: Element, parents: tuple[Element, ...]
+    this: __Element,
+    this_element: Element,
+    that_element: Element,
+    parents: tuple[Element, ...],
 ) -> Error | Groups:
-    if this_element.attrib == that_element.attrib:
+    that_attrib = dict(that_element.attrib)
+    if this.attrib == that_attrib:
         return Groups()
-    if len(this_element.attrib) != len(that_element.attrib):
+    if len(this.attrib) != len(that_attrib):
         return __error(
             parents, this_element, that_element, "Different number of attributes"
         )
     groups = tuple()
-    for this_key, this_value in this_element.attrib.items():
+    for this_key, this_value in this.attrib.items():
         # Don't use zip since attributes in different order should match
-        that_value = that_element.attrib.get(this_key, "")
+        that_value = that_attrib.get(this_key, "")
         m = __match(this_value, that_value)
         if not m:
             return __error(
@@ -76,11 +127,13 @@ def __match_attr(
 
 
 def __match_text(
-    this_element: Element, that_element: Element, parents: tuple[Element, ...]
+    this: __Element,
+    this_element: Element,
+    that_element: Element,
+    parents: tuple[Element, ...],
 ) -> Error | Groups:
-    this_text, that_text = (
-        e.text.strip() if e.text else "" for e in (this_element, that_element)
-    )
+    this_text = this.text
+    that_text = that_element.text.strip() if that_element.text else ""
     if m := __match(this_text, that_text):
         return Groups(groups=tuple(m.groups()))
     return __error(
@@ -92,7 +145,10 @@ def __match_text(
 
 
 def __match_children(
-    this_element: Element, that_element: Element, parents: tuple[Element, ...]
+    this_element: Element,
+    that_element: Element,
+    parents: tuple[Element, ...],
+    memos: tuple[dict[Element, __Element], dict[Element, str]],
 ) -> Error | Groups:
     if len(this_element) != len(that_element):
         return __error(
@@ -102,52 +158,90 @@ def __match_children(
     for this_child, that_child in zip(
         this_element, that_element
     ):  # children must be in same order
-        result = __match_elements(this_child, that_child, parents + (this_element,))
+        result = __match_elements(
+            this_child, that_child, parents + (this_element,), memos
+        )
         if isinstance(result, Error):
             return result
         groups += tuple(result.groups)
     return Groups(groups=groups)
 
 
-def __canonicalize(this_element: Element, that_element: Element) -> tuple[str, str]:
-    this_canonicalized, that_canonicalized = (
-        et.canonicalize(e, strip_text=True, rewrite_prefixes=True)
-        for e in (this_element, that_element)
-    )
-    return this_canonicalized, that_canonicalized
-
-
 def __match_elements(
     this_element: Element,
     that_element: Element,
-    parents: tuple[Element, ...] = (),
+    parents: tuple[Element, ...],
+    memos: tuple[dict[Element, __Element], dict[Element, str]],
 ) -> Error | Groups:
     # Return if as canonicalized strings are equal or match as regexp
-    this_canonicalized, that_canonicalized = __canonicalize(this_element, that_element)
-    if this_canonicalized == that_canonicalized:
+    this = __get_element(this_element, memos[0])
+    that_canonicalized = __canonicalize_that(that_element, memos[1])
+    if this.canonical == that_canonicalized:
         return Groups()
-    if m := __match(this_canonicalized, that_canonicalized):
+    if m := __match(this.canonical, that_canonicalized):
         return Groups(groups=tuple(m.groups()))
     # Match this_element and that_element. Return first Error if encountered, else captured groups
     groups = tuple()
-    for f in __match_tag, __match_attr, __match_text, __match_children:
-        result = f(this_element, that_element, parents)
+    for f in __match_tag, __match_attr, __match_text:
+        result = f(this, this_element, that_element, parents)
         if isinstance(result, Error):
             return result
         groups += result.groups
+    result = __match_children(this_element, that_element, parents, memos)
+    if isinstance(result, Error):
+        return result
+    groups += result.groups
 
     return Groups(groups=groups)
 
 
-def match(this: str, that: str) -> Error | Groups:
+def prepare(this: str) -> Prepared:
+    """
+    Prepares this, i.e. a candidate, to be matched by match.
+    """
+    try:
+        value = et.fromstring(__remove_prolog(this))
+    except XMLSyntaxError as e:
+        return Prepared(this, this, error=f'Cannot parse "this": "{this}", {e}')
+    # Elements are matched at each level of their parents, so prepare them once
+    elements = {
+        element: __prepare_element(element)
+        for element in value.iter()
+        if isinstance(element.tag, str)
+    }
+    return Prepared(this, this, value, forms=elements)
+
+
+def __parse(that: str) -> tuple[Any, str | None]:
+    try:
+        return et.fromstring(__remove_prolog(that)), None
+    except XMLSyntaxError as e:
+        return None, f'Cannot parse "that": "{that}", {e}'
+
+
+def parse_request(request: Request) -> tuple[Any, str | None]:
+    """
+    Returns the parsed request and None, or None and the error if it cannot be
+    parsed. The request is only parsed once, also if used by many candidates.
+    """
+    return request.get("xml", __parse)
+
+
+def __get_canonicals(request: Request) -> dict[Element, str]:
+    return request.get("xml.canonicals", lambda _: {})
+
+
+def match(this: str | Prepared, that: str | Request) -> Error | Groups:
     """
     Matches this and that.
-    The "this" can contain regular expressions.
+    The "this" can contain regular expressions, and can be prepared by prepare.
+    The "that" can be a Request, to parse and canonicalize it only once when matched
+    with many candidates.
     Both "this" and "that" must be valid xml, if they not as a whole matches with
     re.fullmatch(f"(?ms){r}", s).
     Returns an Error or a Groups object.
     """
-    if not (isinstance(this, str) and isinstance(that, str)):
+    if not (isinstance(this, (str, Prepared)) and isinstance(that, (str, Request))):
         # Return error if this and that are not strings
         return __error(
             (),
@@ -155,23 +249,142 @@ def match(this: str, that: str) -> Error | Groups:
             str(that),
             f'Values not strings: "{type(this)}" != "{type(that)}"',
         )
+    prepared = this if isinstance(this, Prepared) else prepare(this)
+    request = that if isinstance(that, Request) else Request(that)
+    that = request.text
 
     # Return if this and that are equal or match as regexp
-    if this == that:
+    if prepared.text == that:
         return Groups()
-    if m := __match(this, that):
+    if m := prepared.pattern.fullmatch(that):
         return Groups(groups=tuple(m.groups()))
 
     # Parse to Elements
-    elements = []
-    for name, xml in ("this", this), ("that", that):
-        try:
-            elements.append(
-                et.fromstring(__remove_prolog(xml)) if isinstance(xml, str) else xml
-            )
-        except XMLSyntaxError as e:
-            return __error((), this, that, f'Cannot parse "{name}": "{xml}", {e}')
-    this_element, that_element = elements
+    if prepared.error:
+        return __error((), prepared.text, that, prepared.error)
+    that_element, error = parse_request(request)
+    if error:
+        return __error((), prepared.text, that, error)
 
     # Match Elements
-    return __match_elements(this_element, that_element)
+    return __match_elements(
+        prepared.value,
+        that_element,
+        (),
+        (prepared.forms, __get_canonicals(request)),
+    )
+
+
+@dataclass(frozen=True)
+class __Node:
+    element: Element
+    canonical: str
+    literals: tuple[str, ...]
+    attribute_literals: dict[str, tuple[str, ...]]
+    text_literals: tuple[str, ...]
+    children: tuple["__Node | None", ...]
+
+
+def __node(element: Element, elements: dict[Element, __Element]) -> __Node | None:
+    if not isinstance(element.tag, str):
+        return None  # E.g. comments and processing instructions
+    this = __get_element(element, elements)
+    return __Node(
+        element,
+        this.canonical,
+        required_literals(this.canonical),
+        {key: required_literals(value) for key, value in this.attrib.items()},
+        required_literals(this.text),
+        tuple(__node(child, elements) for child in element),
+    )
+
+
+def __reject_elements(
+    node: __Node | None,
+    that_element: Element,
+    parents: tuple[Element, ...],
+    canonicals: dict[Element, str],
+) -> Error | None:
+    # Same checks as __match_elements, but only with regexps replaced by their
+    # required literals, i.e. Error is returned only if __match_elements returns Error
+    if node is None or not isinstance(that_element.tag, str):
+        return None
+    this_element = node.element
+    that_canonicalized = __canonicalize_that(that_element, canonicals)
+    if node.canonical == that_canonicalized or all(
+        literal in that_canonicalized for literal in node.literals
+    ):
+        return None
+    if this_element.tag != that_element.tag:
+        return __error(
+            parents,
+            this_element,
+            that_element,
+            f'Rejected by prefilter, names not matching: "{this_element.tag}" != "{that_element.tag}"',
+        )
+    if this_element.attrib != that_element.attrib:
+        if len(this_element.attrib) != len(that_element.attrib):
+            return __error(
+                parents,
+                this_element,
+                that_element,
+                "Rejected by prefilter, different number of attributes",
+            )
+        for key, literals in node.attribute_literals.items():
+            that_value = that_element.attrib.get(key, "")
+            for literal in literals:
+                if literal not in that_value:
+                    return __error(
+                        parents,
+                        this_element,
+                        that_element,
+                        f'Rejected by prefilter, "{literal}" not found in attribute {key}',
+                    )
+    that_text = that_element.text.strip() if that_element.text else ""
+    for literal in node.text_literals:
+        if literal not in that_text:
+            return __error(
+                parents,
+                this_element,
+                that_element,
+                f'Rejected by prefilter, "{literal}" not found in text',
+            )
+    if len(this_element) != len(that_element):
+        return __error(
+            parents,
+            this_element,
+            that_element,
+            "Rejected by prefilter, different number of children",
+        )
+    for child, that_child in zip(node.children, that_element):
+        if error := __reject_elements(
+            child, that_child, parents + (this_element,), canonicals
+        ):
+            return error
+    return None
+
+
+def prefilter(prepared: Prepared) -> Callable[[Request], Error | None]:
+    """
+    Returns a function that cheaply returns an Error if the prepared candidate cannot
+    match a request, else None.
+    Regular expressions are not evaluated, instead the literals they require must be
+    found, in the request as a whole or in its elements.
+    """
+    literals = required_literals(prepared.source)
+    node = None if prepared.error else __node(prepared.value, prepared.forms)
+
+    def reject(request: Request) -> Error | None:
+        that = request.text
+        if prepared.text == that:
+            return None
+        if all(literal in that for literal in literals):
+            return None
+        if prepared.error:
+            return __error((), prepared.text, that, prepared.error)
+        that_element, error = parse_request(request)
+        if error:
+            return __error((), prepared.text, that, error)
+        return __reject_elements(node, that_element, (), __get_canonicals(request))
+
+    return reject
@@ -0,0 +1,143 @@
+import mmap
+import os
+import re
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator
+
+__placeholder = re.compile(rb"\$\{([1-9][0-9]*)\}")
+__text_placeholder = re.compile(r"\$\{([1-9][0-9]*)\}")
+
+# The max number of bytes read from file per chunk
+CHUNK_SIZE = 1 << 16
+
+
+@dataclass(frozen=True)
+class Template:
+    """
+    A response file split at its placeholders, ${1}, ${2}, etc., located when loaded,
+    so that it can be streamed with the placeholders replaced chunk by chunk.
+    parts are (offset, count, group) of the file, where group is the number of the
+    placeholder, or 0 for the text between placeholders.
+    signature is the (mtime, size) of the file when loaded.
+    """
+
+    path: str
+    parts: tuple[tuple[int, int, int], ...]
+    signature: tuple[int, int] | None = field(default=None, compare=False)
+
+    @property
+    def static(self) -> bool:
+        return all(group == 0 for _, _, group in self.parts)
+
+    def values(self, groups: tuple[str, ...]) -> tuple[tuple[int, int] | bytes, ...]:
+        """
+        Returns the (offset, count) of the file to send, and the encoded groups that
+        replace placeholders. Placeholders without a group are kept.
+        """
+        values = []
+        for offset, count, group in self.parts:
+            if 0 < group <= len(groups):
+                values.append(groups[group - 1].encode("utf-8"))
+            elif values and isinstance(values[-1], tuple) and sum(values[-1]) == offset:
+                values[-1] = (values[-1][0], values[-1][1] + count)
+            else:
+                values.append((offset, count))
+        return tuple(values)
+
+    def length(self, groups: tuple[str, ...]) -> int:
+        return sum(
+            v[1] if isinstance(v, tuple) else len(v) for v in self.values(groups)
+        )
+
+    def chunks(
+        self, groups: tuple[str, ...], file: BinaryIO | None = None
+    ) -> Iterator[bytes]:
+        """
+        Yields the file, or the opened file, see reopen, with the placeholders
+        replaced by groups. The file is closed when done.
+        """
+        with file or open(self.path, "rb") as f:
+            for value in self.values(groups):
+                if isinstance(value, bytes):
+                    yield value
+                    continue
+                offset, count = value
+                f.seek(offset)
+                while count > 0:
+                    chunk = f.read(min(count, CHUNK_SIZE))
+                    if not chunk:
+                        raise EOFError(f"{self.path} changed while read")
+                    count -= len(chunk)
+                    yield chunk
+
+
+def split(text: str) -> tuple[str | int, ...]:
+    """
+    Returns text split at its placeholders, i.e. the text between placeholders at
+    even indexes and the numbers of the placeholders at odd indexes, see render.
+    """
+    parts: list[str | int] = __text_placeholder.split(text)
+    for index in range(1, len(parts), 2):
+        parts[index] = int(parts[index])
+    return tuple(parts)
+
+
+def placeholders(parts: tuple[str | int, ...]) -> set[int]:
+    return set(parts[1::2])
+
+
+def render(parts: tuple[str | int, ...], groups: tuple[str, ...]) -> str:
+    """
+    Returns the text of parts, see split, with its placeholders replaced by groups.
+    Placeholders without a group are kept.
+    """
+    values = list(parts)
+    for index in range(1, len(values), 2):
+        number = values[index]
+        values[index] = (
+            groups[number - 1] if number <= len(groups) else f"${{{number}}}"
+        )
+    return "".join(values)
+
+
+def __scan(path: str, f: BinaryIO) -> Template:
+    s = os.fstat(f.fileno())
+    parts = []
+    end = 0
+    if s.st_size:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            for placeholder in __placeholder.finditer(m):
+                start = placeholder.start()
+                if start > end:
+                    parts.append((end, start - end, 0))
+                end = placeholder.end()
+                parts.append((start, end - start, int(placeholder.group(1))))
+    if s.st_size > end:
+        parts.append((end, s.st_size - end, 0))
+    return Template(path, tuple(parts), (s.st_mtime_ns, s.st_size))
+
+
+def load(path: str) -> Template:
+    """
+    Returns the template of the response file at path. The file is scanned, not read
+    into memory.
+    """
+    with open(path, "rb") as f:
+        return __scan(path, f)
+
+
+def reopen(template: Template) -> tuple[Template, BinaryIO]:
+    """
+    Opens the file of template, and returns the template of the opened file with it.
+    The file is scanned again if it changed since template was loaded, so the
+    offsets of the parts are those of the opened file.
+    """
+    f = open(template.path, "rb")
+    try:
+        s = os.fstat(f.fileno())
+        if (s.st_mtime_ns, s.st_size) != template.signature:
+            template = __scan(template.path, f)
+    except BaseException:
+        f.close()
+        raise
+    return template, f
@@ -1,3 +1,4 @@
+import logging
 from importlib import reload
 from posixpath import dirname
 
@@ -62,3 +63,51 @@ def test_service_no_match():
     assert core.service(
         root_dir, "json", '{"foo": "Hello World!"}', "json"
     ) is core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+
+
+def test_service_find_matches_function(monkeypatch):
+    from rsimulator_core import config, core
+    from rsimulator_core.regex import find_matches
+
+    monkeypatch.setattr(config, "CACHE", False)
+    calls = []
+
+    def find_matches_without_first_match(*args):
+        calls.append(args[4:])
+        return find_matches(*args)
+
+    config.set_find_matches_function("json", find_matches_without_first_match)
+    try:
+        assert core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+        monkeypatch.setattr(config, "FIRST_MATCH", True)
+        assert core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+    finally:
+        config.set_find_matches_function("json", find_matches)
+
+    assert calls == [(), (True,)]
+
+
+def test_service_summary(monkeypatch, caplog):
+    from rsimulator_core import config, core
+    from rsimulator_core.decorators import cache_clear
+
+    monkeypatch.setattr(config, "CACHE", True)
+    cache_clear()
+    caplog.set_level(logging.INFO, "rsimulator_core.summary")
+
+    for _ in range(3):
+        core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+    cache_clear()
+
+    records = [r for r in caplog.records if r.name == "rsimulator_core.summary"]
+    assert [r.getMessage() for r in records] == [
+        "Service matched 1 of 2 candidates",
+        "Service answered without matching, e.g. cached",
+        "Service answered without matching, e.g. cached",
+    ]
+    assert [(r.cached, r.matches, r.no_matches) for r in records] == [
+        (False, 1, 1),
+        (True, None, None),
+        (True, None, None),
+    ]
+    assert {r.candidate_path for r in records} == {f"{root_dir}/json/1_Request.json"}
@@ -0,0 +1,201 @@
+from os import utime
+from threading import current_thread
+from time import monotonic, sleep
+
+import pytest
+from rsimulator_core import config, decorators
+from rsimulator_core.data import CacheStats, Match
+from rsimulator_core.decorators import cache, cache_clear, cache_stats, script
+from rsimulator_core.template import load
+
+
+@script
+def service(root_path, request):
+    return None
+
+
+def test_script(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SCRIPT_MISSING_TTL", 60.0)
+    script_path = tmp_path / "global_request.py"
+
+    # Not executed if it does not exist, which is cached
+    assert service(str(tmp_path), "request") is None
+    script_path.write_text("kwargs['response'] = 'first'")
+    assert service(str(tmp_path), "request") is None
+
+    # Executed when it exists
+    monkeypatch.setattr(config, "SCRIPT_MISSING_TTL", 0.0)
+    assert service(str(tmp_path), "request") == "first"
+    assert service(str(tmp_path), "request") == "first"
+
+    # Executed again if changed
+    script_path.write_text("kwargs['response'] = 'second'")
+    utime(script_path, ns=(0, 0))
+    assert service(str(tmp_path), "request") == "second"
+
+    # Not executed if deleted
+    script_path.unlink()
+    assert service(str(tmp_path), "request") is None
+
+
+@script
+def streamed_service(root_path, request):
+    template = load(f"{root_path}/1_Response.txt")
+    return Match(
+        request, f"{root_path}/1_Request.txt", "", "", "", "", template, ("x",)
+    )
+
+
+def test_script_streamed(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SCRIPT_MISSING_TTL", 0.0)
+    (tmp_path / "1_Response.txt").write_text("a${1}")
+    assert streamed_service(str(tmp_path), "request").template
+
+    # Scripts get and can change the response, which is then not streamed
+    (tmp_path / "1_.py").write_text(
+        "response = kwargs['response']\n"
+        "kwargs['response'] = response.response + response.response_raw"
+    )
+    assert streamed_service(str(tmp_path), "request") == "axa${1}"
+
+
+@cache
+def cached_service(root_path, request):
+    return Match(request, f"{root_path}/1_Request.txt", "", "", "", request.upper())
+
+
+@pytest.fixture
+def cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE", True)
+    monkeypatch.setattr(config, "CACHE_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(config, "SCRIPT_MISSING_TTL", 0.0)
+    cache_clear()
+    yield tmp_path
+    cache_clear()
+
+
+def size(response):
+    return len(response.request + response.candidate_path + response.response)
+
+
+def test_cache(cached):
+    response = cached_service(str(cached), "a")
+    assert cached_service(str(cached), "a") is response
+    assert cached_service(str(cached), "b") is not response
+    assert cache_stats() == CacheStats(
+        entries=2,
+        bytes=2 * size(response),
+        hits=1,
+        misses=2,
+        evictions=0,
+        invalidations=0,
+        bypasses=0,
+    )
+
+
+def test_cache_invalidation(cached):
+    (cached / "1_Request.txt").write_text("a")
+    response = cached_service(str(cached), "a")
+    assert cached_service(str(cached), "a") is response
+
+    (cached / "1_Request.txt").write_text("b")
+    utime(cached / "1_Request.txt", ns=(0, 0))
+    assert cached_service(str(cached), "a") is not response
+    assert cache_stats().invalidations == 1
+
+
+def test_cache_invalidation_dangling_symlink(cached):
+    (cached / "0_Request.txt").symlink_to(cached / "missing")
+    (cached / "1_Request.txt").write_text("a")
+    response = cached_service(str(cached), "a")
+
+    # The files after the symlink are still checked
+    (cached / "1_Request.txt").write_text("b")
+    utime(cached / "1_Request.txt", ns=(0, 0))
+    assert cached_service(str(cached), "a") is not response
+    assert cache_stats().invalidations == 1
+
+
+def test_cache_check_interval(cached, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_CHECK_INTERVAL", 60.0)
+    (cached / "1_Request.txt").write_text("a")
+    response = cached_service(str(cached), "a")
+
+    # Not checked again within the interval
+    monkeypatch.setattr(decorators, "scandir", None)
+    (cached / "1_Request.txt").write_text("b")
+    assert cached_service(str(cached), "a") is response
+    assert cache_stats().invalidations == 0
+
+
+def test_cache_check_background(cached, monkeypatch):
+    (cached / "1_Request.txt").write_text("a")
+    response = cached_service(str(cached), "a")
+
+    # Scanned by another thread than the one of the call
+    monkeypatch.setattr(config, "CACHE_CHECK_INTERVAL", 0.001)
+    signature = getattr(decorators, "__signature")
+    threads = []
+
+    def scanned(root_path):
+        threads.append(current_thread())
+        return signature(root_path)
+
+    monkeypatch.setattr(decorators, "__signature", scanned)
+    (cached / "1_Request.txt").write_text("b")
+    utime(cached / "1_Request.txt", ns=(0, 0))
+    sleep(0.01)
+    cached_service(str(cached), "a")
+    deadline = monotonic() + 10.0
+    while not cache_stats().invalidations:
+        assert monotonic() < deadline
+        sleep(0.01)
+
+    assert threads and current_thread() not in threads
+    assert cached_service(str(cached), "a") is not response
+
+
+def test_cache_bounds(cached, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_MAX_ENTRIES", 2)
+    for request in "a", "b", "c":
+        cached_service(str(cached), request)
+    assert cache_stats().entries == 2
+    assert cache_stats().evictions == 1
+
+    response = cached_service(str(cached), "d")
+    monkeypatch.setattr(config, "CACHE_MAX_BYTES", size(response) + 2)
+    cached_service(str(cached), "ee")
+    assert cache_stats().entries == 1
+    assert cache_stats().bytes == size(response) + 2
+    cached_service(str(cached), "fff")  # Too large
+    assert cache_stats().entries == 1
+
+    monkeypatch.setattr(config, "CACHE_TTL", 0.0)
+    response = cached_service(str(cached), "g")
+    assert cached_service(str(cached), "g") is not response
+
+
+def test_cache_dynamic(cached):
+    (cached / "global_response.py").write_text("# Does nothing")
+    response = cached_service(str(cached), "a")
+    assert cached_service(str(cached), "a") is response
+
+    (cached / "1_.py").write_text("kwargs['response'] = None")
+    assert cached_service(str(cached), "b") is not cached_service(str(cached), "b")
+    assert cache_stats().bypasses == 2
+
+
+def test_cache_digest(cached, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_DIGEST", True)
+    request = "a" * 1000
+    response = cached_service(str(cached), request)
+    cached_response = cached_service(str(cached), "".join(request))
+    assert cached_response == response
+    assert cached_response.request is not request
+    assert cache_stats().hits == 1
+
+    # The request is not kept
+    assert cache_stats().bytes == size(response) - len(request)
+
+    assert cached_service(str(cached), request + "b") != response
+    assert cache_stats().entries == 2
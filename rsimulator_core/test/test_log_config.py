@@ -0,0 +1,54 @@
+import json
+import logging
+import subprocess
+import sys
+from os.path import dirname
+
+import pytest
+from rsimulator_core import config, core, log_config
+
+root_dir = f"{dirname(__file__)}/../regex/test/data"
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    log_config.stop()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    logging.getLogger("rsimulator_core.summary").setLevel(logging.NOTSET)
+
+
+def test_import():
+    code = "import logging, rsimulator_core; r = logging.getLogger(); print(r.handlers, r.level)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True
+    )
+    assert result.stdout == f"[] {logging.WARNING}\n"
+
+
+def test_configure_production(root_logger, capsys, monkeypatch):
+    monkeypatch.setattr(config, "CACHE", False)
+    log_config.configure("production")
+    assert root_logger.level == logging.WARNING
+
+    core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+    logging.getLogger("rsimulator_core.core").debug("Not logged")
+    log_config.stop()
+
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r["logger"] for r in records] == ["rsimulator_core.summary"]
+    assert records[0]["message"] == "Service matched 1 of 2 candidates"
+    assert records[0]["candidate_path"] == f"{root_dir}/json/1_Request.json"
+    assert records[0]["content_type"] == "json"
+
+
+def test_configure_development(root_logger, capsys):
+    log_config.configure("production")
+    log_config.configure("development")
+    assert root_logger.level == logging.DEBUG
+
+    logging.getLogger("rsimulator_core.core").debug("Logged")
+    assert "DEBUG rsimulator_core.core Logged" in capsys.readouterr().out
@@ -0,0 +1,61 @@
+import pytest
+from rsimulator_core import profile
+from rsimulator_core.profile import get_profile, parse
+from rsimulator_core.regex import config as regex_config
+
+
+@pytest.mark.parametrize(
+    "text, low, high",
+    [
+        ('{"latency": {"value": 0.1}}', 0.1, 0.1),
+        ('{"latency": {"type": "fixed", "value": 0.1}}', 0.1, 0.1),
+        ('{"latency": {"type": "uniform", "min": 0.1, "max": 0.2}}', 0.1, 0.2),
+        ('{"latency": {"type": "normal", "mean": 0.1, "stddev": 1}}', 0.0, 10.0),
+        ('{"latency": {"type": "percentiles", "table": {"50": 1}}}', 1.0, 1.0),
+        (
+            '{"latency": {"type": "percentiles", "table": {"0": 1, "90": 2, "100": 4}}}',
+            1.0,
+            4.0,
+        ),
+        ('{"bandwidth": 1000}', 0.0, 0.0),
+    ],
+)
+def test_parse(text, low, high):
+    delays = [parse(text).delay() for _ in range(100)]
+    assert low <= min(delays) <= max(delays) <= high
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"latency": {"type": "constant", "value": 0.1}}',
+        '{"latency": {"type": "uniform", "min": 0.1}}',
+        '{"latency": {"type": "percentiles", "table": {"101": 1}}}',
+        '{"bandwidth": 0}',
+    ],
+)
+def test_parse_invalid(text):
+    with pytest.raises((KeyError, ValueError)):
+        parse(text)
+
+
+def test_get_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(regex_config, "CHECK_INTERVAL", 0.0)
+    profile.clear()
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    candidate_path = str(tmp_path / "a" / "b" / "1_Request.json")
+    assert get_profile(str(tmp_path), candidate_path) is None
+
+    (tmp_path / "Profile.json").write_text('{"bandwidth": 1}')
+    assert get_profile(str(tmp_path), candidate_path).bandwidth == 1
+
+    (tmp_path / "a" / "Profile.json").write_text('{"bandwidth": 2}')
+    assert get_profile(str(tmp_path), candidate_path).bandwidth == 2
+
+    (tmp_path / "a" / "b" / "1_Profile.json").write_text('{"bandwidth": 3}')
+    assert get_profile(str(tmp_path), candidate_path).bandwidth == 3
+
+    # Not within root_path
+    assert get_profile(str(tmp_path / "a" / "b"), candidate_path).bandwidth == 3
+    (tmp_path / "a" / "b" / "1_Profile.json").unlink()
+    assert get_profile(str(tmp_path / "a" / "b"), candidate_path) is None
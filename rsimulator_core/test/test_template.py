@@ -0,0 +1,65 @@
+import pytest
+from rsimulator_core import template
+from rsimulator_core.template import Template, load, render, reopen, split
+
+
+def test_load(tmp_path):
+    path = tmp_path / "1_Response.txt"
+    path.write_text("a${1}bc${2}${01}${3}")
+    assert load(str(path)) == Template(
+        str(path), ((0, 1, 0), (1, 4, 1), (5, 2, 0), (7, 4, 2), (11, 5, 0), (16, 4, 3))
+    )
+
+    path.write_text("")
+    assert load(str(path)) == Template(str(path), ())
+    assert load(str(path)).static
+
+
+@pytest.mark.parametrize(
+    "text, groups, expected",
+    [
+        ("abc", (), "abc"),
+        ("a${1}b", ("x",), "axb"),
+        ("${1}${2}", ("x", "åäö"), "xåäö"),
+        ("${2}a${1}", ("",), "${2}a"),
+        ("${1}${1}", ("${1}",), "${1}${1}"),
+    ],
+)
+def test_chunks(tmp_path, monkeypatch, text, groups, expected):
+    monkeypatch.setattr(template, "CHUNK_SIZE", 2)
+    path = tmp_path / "1_Response.txt"
+    path.write_text(text)
+    loaded = load(str(path))
+    assert b"".join(loaded.chunks(groups)).decode() == expected
+    assert loaded.length(groups) == len(expected.encode())
+    assert loaded.static == ("${" not in text)
+
+
+@pytest.mark.parametrize(
+    "text, parts, groups, expected",
+    [
+        ("", ("",), (), ""),
+        ("abc", ("abc",), ("x",), "abc"),
+        ("a${1}b${2}", ("a", 1, "b", 2, ""), ("x", "y"), "axby"),
+        ("${2}${1}${2}", ("", 2, "", 1, "", 2, ""), ("x", "y"), "yxy"),
+        ("${1}${3}$${01}", ("", 1, "", 3, "$${01}"), ("x",), "x${3}$${01}"),
+    ],
+)
+def test_split_render(text, parts, groups, expected):
+    assert split(text) == parts
+    assert render(parts, groups) == expected
+
+
+def test_reopen(tmp_path):
+    path = tmp_path / "1_Response.txt"
+    path.write_text("a${1}b")
+    loaded = load(str(path))
+    template, f = reopen(loaded)
+    assert template is loaded
+    assert b"".join(template.chunks(("x",), f)) == b"axb"
+    assert f.closed
+
+    # Scanned again if changed since loaded
+    path.write_text("abc${1}d")
+    template, f = reopen(loaded)
+    assert b"".join(template.chunks(("x",), f)) == b"abcxd"
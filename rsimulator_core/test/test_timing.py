@@ -0,0 +1,76 @@
+from posixpath import dirname
+from urllib.request import urlopen
+
+from rsimulator_core import core, timing
+
+root_dir = f"{dirname(__file__)}/../regex/test/data"
+
+
+def test_histogram():
+    histogram = timing.Histogram((0.1, 1.0))
+    histogram("match", 0.05)
+    histogram("match", 0.5)
+    histogram("match", 5.0)
+    histogram("read", 0.1)
+
+    assert histogram.snapshot() == {
+        "match": {
+            "count": 3,
+            "sum": 5.55,
+            "buckets": {0.1: 1, 1.0: 2, float("inf"): 3},
+        },
+        "read": {"count": 1, "sum": 0.1, "buckets": {0.1: 1, 1.0: 1, float("inf"): 1}},
+    }
+    assert histogram.prometheus().splitlines()[2:7] == [
+        'rsimulator_phase_seconds_bucket{phase="match",le="0.1"} 1',
+        'rsimulator_phase_seconds_bucket{phase="match",le="1.0"} 2',
+        'rsimulator_phase_seconds_bucket{phase="match",le="+Inf"} 3',
+        'rsimulator_phase_seconds_sum{phase="match"} 5.55',
+        'rsimulator_phase_seconds_count{phase="match"} 3',
+    ]
+
+    histogram.clear()
+    assert histogram.snapshot() == {}
+
+
+def test_serve_prometheus():
+    histogram = timing.Histogram()
+    histogram("match", 0.001)
+    server = timing.serve_prometheus(histogram, port=0)
+    try:
+        with urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as r:
+            assert r.read().decode("utf-8") == histogram.prometheus()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_service_phases(monkeypatch):
+    monkeypatch.setattr(core.config, "CACHE", False)
+    phases = []
+    timing.set_sink(lambda phase, seconds: phases.append(phase))
+    try:
+        assert core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+    finally:
+        timing.set_sink(None)
+
+    assert {"service", "discovery", "match", "substitution", "script"} <= set(phases)
+
+
+def test_service_phase_cached(monkeypatch):
+    monkeypatch.setattr(core.config, "CACHE", True)
+    phases = []
+    timing.set_sink(lambda phase, seconds: phases.append(phase))
+    try:
+        for _ in range(2):
+            assert core.service(root_dir, "json", '{"foo": "Hello World!"}', "json")
+    finally:
+        timing.set_sink(None)
+
+    assert phases.count("service") == 2
+
+
+def test_disabled():
+    assert timing.get_sink() is None
+    assert timing.start() == 0.0
+    timing.record("match", 0.0)
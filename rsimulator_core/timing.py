@@ -0,0 +1,155 @@
+import logging
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Callable
+
+log = logging.getLogger(__name__)
+
+# Receives the phase, e.g. "match", and its duration in seconds
+Sink = Callable[[str, float], None]
+
+# Upper bounds, in seconds, of the buckets of Histogram
+BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+__sink: Sink | None = None
+
+
+def get_sink() -> Sink | None:
+    return __sink
+
+
+def set_sink(sink: Sink | None) -> None:
+    """
+    Sets the sink of the phase timings recorded by core.service, decorators.script,
+    matcher.find_matches and store, e.g. a Histogram or any callback.
+    None, the default, disables timing.
+    Phases: service, discovery, read, parse, match, script and substitution.
+    The phases nest, so their durations do not add up: service is the whole call of
+    core.service, including the others, and the first match of a request includes
+    its parse.
+    """
+    global __sink
+    __sink = sink
+
+
+def start() -> float:
+    """
+    Returns the start time of a phase to record, or 0.0 if timing is disabled.
+    """
+    return perf_counter() if __sink else 0.0
+
+
+def record(phase: str, started: float) -> None:
+    if started and (sink := __sink):
+        sink(phase, perf_counter() - started)
+
+
+class Histogram:
+    """
+    A Sink that counts durations per key, e.g. phase, in buckets by upper bound.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.__lock = Lock()
+        # Key -> count per bucket, the last for durations above all bounds
+        self.__counts: dict[str, list[int]] = {}
+        self.__sums: dict[str, float] = {}
+
+    def __call__(self, key: str, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self.__lock:
+            counts = self.__counts.get(key)
+            if counts is None:
+                counts = self.__counts[key] = [0] * (len(self.buckets) + 1)
+                self.__sums[key] = 0.0
+            counts[index] += 1
+            self.__sums[key] += seconds
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Returns the count, sum and cumulative bucket counts, by upper bound, per key.
+        """
+        with self.__lock:
+            counts = {key: list(c) for key, c in self.__counts.items()}
+            sums = dict(self.__sums)
+        snapshot = {}
+        for key, key_counts in sorted(counts.items()):
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets + (float("inf"),), key_counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            snapshot[key] = {"count": cumulative, "sum": sums[key], "buckets": buckets}
+        return snapshot
+
+    def prometheus(
+        self,
+        name: str = "rsimulator_phase_seconds",
+        label: str = "phase",
+        description: str = "Time spent per phase of core.service",
+    ) -> str:
+        """
+        Returns the histogram in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        for key, value in self.snapshot().items():
+            escaped = key.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            key_label = f'{label}="{escaped}"'
+            for bound, count in value["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{name}_bucket{{{key_label},le="{le}"}} {count}')
+            lines.append(f"{name}_sum{{{key_label}}} {value['sum']!r}")
+            lines.append(f"{name}_count{{{key_label}}} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__counts.clear()
+            self.__sums.clear()
+
+
+def serve_prometheus(
+    histogram: Histogram, host: str = "127.0.0.1", port: int = 9464
+) -> ThreadingHTTPServer:
+    """
+    Serves histogram in the Prometheus text format at http://<host>:<port>/metrics,
+    in a daemon thread. Stop it with shutdown().
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = histogram.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            log.debug(format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
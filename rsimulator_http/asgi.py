@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from time import perf_counter
+from typing import Any, Awaitable, BinaryIO, Callable, Iterator
+
+import rsimulator_core.core as core
+import rsimulator_http.config as cfg
+from rsimulator_core.data import Match
+from rsimulator_core.profile import Profile, get_profile
+from rsimulator_core.template import Template, reopen
+from rsimulator_http import metrics
+from rsimulator_http.content import get_content_encoding, get_content_type
+
+log = logging.getLogger(__name__)
+
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+METHODS = ("GET", "HEAD", "POST", "PUT", "DELETE")
+
+__executor: ThreadPoolExecutor | None = None
+
+
+def __get_executor() -> ThreadPoolExecutor:
+    global __executor
+    if __executor is None:
+        __executor = ThreadPoolExecutor(cfg.THREADS, thread_name_prefix="rsimulator")
+    return __executor
+
+
+def __shutdown() -> None:
+    global __executor
+    if __executor is not None:
+        __executor.shutdown()
+        __executor = None
+
+
+def __get_header(scope: dict[str, Any], name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def __read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("Client disconnected")
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def __start(status: int, content_type: str, length: int) -> dict[str, Any]:
+    return {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", f"{content_type}; charset=utf-8".encode()),
+            (b"content-length", str(length).encode()),
+        ],
+    }
+
+
+def __split(chunks: Iterator[bytes], size: int) -> Iterator[bytes]:
+    for chunk in chunks:
+        for offset in range(0, len(chunk), size):
+            yield chunk[offset : offset + size]
+
+
+async def __send_body(
+    send: Send,
+    chunks: Iterator[bytes],
+    length: int,
+    bandwidth: float | None,
+    blocking: bool = False,
+) -> None:
+    # Sends length bytes of chunks, read in the default executor if blocking
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    if bandwidth:
+        chunks = __split(chunks, max(1, int(bandwidth * cfg.THROTTLE_INTERVAL)))
+    sent = 0
+    while sent < length:
+        chunk = (
+            await loop.run_in_executor(None, next, chunks) if blocking else next(chunks)
+        )
+        sent += len(chunk)
+        if bandwidth:
+            await asyncio.sleep(start + sent / bandwidth - loop.time())
+        await send(
+            {"type": "http.response.body", "body": chunk, "more_body": sent < length}
+        )
+    if length == 0:
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def __send_file(
+    send: Send, template: Template, groups: tuple[str, ...], f: BinaryIO
+) -> None:
+    # Sends the parts of the file with the zero-copy extension, i.e. with sendfile
+    values = template.values(groups)
+    with f:
+        for index, value in enumerate(values):
+            more_body = index < len(values) - 1
+            if isinstance(value, bytes):
+                message = {"type": "http.response.body", "body": value}
+            else:
+                message = {
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": value[0],
+                    "count": value[1],
+                }
+            await send(message | {"more_body": more_body})
+    if not values:
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def respond(
+    send: Send,
+    status: int,
+    body: bytes,
+    content_type: str = "text/html",
+    bandwidth: float | None = None,
+) -> None:
+    """
+    Sends a response, in chunks paced to bandwidth bytes per second if given.
+    """
+    await send(__start(status, content_type, len(body)))
+    await __send_body(send, iter((body,)), len(body), bandwidth)
+
+
+async def stream(
+    send: Send,
+    template: Template,
+    groups: tuple[str, ...],
+    bandwidth: float | None = None,
+    zerocopy: bool = False,
+) -> None:
+    """
+    Sends a response streamed from the file of template, with its placeholders
+    replaced by groups. If zerocopy is True, i.e. the server supports the zero-copy
+    send extension, and bandwidth is not throttled, the file is sent with sendfile.
+    The file is scanned again if it changed since template was loaded.
+    """
+    loop = asyncio.get_running_loop()
+    template, f = await loop.run_in_executor(None, reopen, template)
+    length = template.length(groups)
+    await send(__start(200, "text/html", length))
+    if zerocopy and not bandwidth:
+        await __send_file(send, template, groups, f)
+    else:
+        with f, closing(template.chunks(groups, f)) as chunks:
+            await __send_body(send, chunks, length, bandwidth, True)
+
+
+def __service(
+    path: str, request: str, content_type: str
+) -> tuple[Match | None, Profile | None]:
+    start = perf_counter()
+    core_response = core.service(cfg.ROOT_PATH, path, request, content_type)
+    metrics.record(cfg.ROOT_PATH, core_response, perf_counter() - start)
+    if core_response:
+        return core_response, get_profile(cfg.ROOT_PATH, core_response.candidate_path)
+    return None, None
+
+
+async def __metrics(scope: dict[str, Any], send: Send) -> None:
+    if scope["method"] != "GET":
+        return await respond(send, 405, b"Method Not Allowed")
+    if b"format=prometheus" in scope.get("query_string", b"").split(b"&"):
+        return await respond(send, 200, metrics.prometheus().encode(), "text/plain")
+    body = json.dumps(metrics.snapshot()).encode()
+    await respond(send, 200, body, "application/json")
+
+
+async def __lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            __get_executor()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            __shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope: dict[str, Any], receive: Receive, send: Send) -> None:
+    """
+    ASGI application that serves the same requests as rsimulator_http.http.
+    core.service is called in a pool of config.THREADS threads, so the event loop
+    keeps serving other connections while a request is matched.
+    The latency and bandwidth of the profile of the matching candidate, see
+    rsimulator_core.profile, are simulated without blocking a thread.
+    Responses with a template, see rsimulator_core.template, are streamed from file.
+    GET config.METRICS_PATH serves rsimulator_http.metrics as json, or in the
+    Prometheus text format with the query string format=prometheus.
+    """
+    if scope["type"] == "lifespan":
+        return await __lifespan(receive, send)
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported scope type: {scope['type']}")
+    if scope["path"] == cfg.METRICS_PATH:
+        return await __metrics(scope, send)
+    if scope["method"] not in METHODS:
+        return await respond(send, 405, b"Method Not Allowed")
+    content_type = __get_header(scope, b"content-type")
+    body = await __read_body(receive)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    core_response, profile = await loop.run_in_executor(
+        __get_executor(),
+        __service,
+        scope["path"].lstrip("/"),
+        body.decode(get_content_encoding(content_type)),
+        get_content_type(content_type),
+    )
+    if not core_response:
+        return await respond(send, 404, b"Not Found")
+    if profile:
+        # Matching is part of the latency
+        await asyncio.sleep(profile.delay() - (loop.time() - start))
+    bandwidth = profile and profile.bandwidth
+    if core_response.template:
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        await stream(
+            send, core_response.template, core_response.groups, bandwidth, zerocopy
+        )
+    else:
+        await respond(
+            send, 200, core_response.response.encode("utf-8"), bandwidth=bandwidth
+        )
@@ -1,3 +1,35 @@
 from os.path import dirname
 
 ROOT_PATH = dirname(__file__) + "/test/data"
+
+# Configure the address served by rsimulator_http.server
+HOST = "127.0.0.1"
+PORT = 5000
+
+# Configure the max number of threads that call core.service, see rsimulator_http.asgi
+THREADS = 16
+
+# Configure the max size, in bytes, of the request line, of the headers and of the
+# body, and the max number of headers, of requests served by rsimulator_http.server.
+# Larger requests are responded with 414, 431 and 413 respectively
+MAX_REQUEST_LINE = 8192
+MAX_HEADER_SIZE = 65536
+MAX_HEADERS = 100
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+# Configure how long, in seconds, rsimulator_http.server waits for the next request on
+# a connection before closing it, None means no limit
+KEEP_ALIVE_TIMEOUT = 5.0
+
+# Configure how often, in seconds, a chunk is sent when bandwidth is throttled
+THROTTLE_INTERVAL = 0.1
+
+# Configure how long, in seconds, requests being served are waited for when stopping
+SHUTDOWN_TIMEOUT = 10.0
+
+# Configure how often, in seconds, rsimulator_http.prefork checks ROOT_PATH for changes
+RELOAD_INTERVAL = 1.0
+
+# Configure the path of the metrics, see rsimulator_http.metrics, which is therefore
+# not simulated
+METRICS_PATH = "/__admin/metrics"
@@ -0,0 +1,14 @@
+def get_content_type(content_type: str | None = "") -> str:
+    content_type = content_type or ""
+    if "json" in content_type:
+        return "json"
+    if "xml" in content_type:
+        return "xml"
+    return "txt"
+
+
+def get_content_encoding(content_type: str | None = "") -> str:
+    split = (content_type or "").split(";")
+    if len(split) == 2:
+        return split[1].split("=")[1]
+    return "utf-8"
@@ -1,44 +1,33 @@
 #!/usr/bin/env python3
+import json
 import logging
-import sys
+from time import perf_counter
 
-from flask import Flask, abort
+from flask import Flask, Response, abort
 from flask import request
 
 import rsimulator_core.core as core
 import rsimulator_http.config as cfg
+from rsimulator_core import log_config
+from rsimulator_core.template import reopen
+from rsimulator_http import metrics
+from rsimulator_http.content import get_content_encoding, get_content_type
 
 app = Flask(__name__)
 
+log = logging.getLogger(__name__)
 
-def get_log():
-    log_formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
-    the_log = logging.getLogger()
-    the_log.setLevel(logging.DEBUG)
 
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(log_formatter)
-    the_log.addHandler(console_handler)
-
-    return the_log
-
-
-log = get_log()
-
-
-def get_content_type(content_type=""):
-    if "json" in content_type:
-        return "json"
-    if "xml" in content_type:
-        return "xml"
-    return "txt"
-
-
-def get_content_encoding(content_type=""):
-    split = content_type.split(";")
-    if len(split) == 2:
-        return split[1].split("=")[1]
-    return "utf-8"
+@app.before_request
+def get_metrics():
+    # Not a route, since config.METRICS_PATH is not simulated for any method
+    if request.path != cfg.METRICS_PATH:
+        return None
+    if request.method != "GET":
+        abort(405, valid_methods=["GET"])
+    if request.args.get("format") == "prometheus":
+        return Response(metrics.prometheus(), mimetype="text/plain")
+    return Response(json.dumps(metrics.snapshot()), mimetype="application/json")
 
 
 @app.route(
@@ -46,17 +35,23 @@ def get_content_encoding(content_type=""):
 )
 @app.route("/<path:root_relative_path>", methods=["GET", "POST", "PUT", "DELETE"])
 def service(root_relative_path):
+    start = perf_counter()
     core_response = core.service(
         cfg.ROOT_PATH,
         root_relative_path,
         request.data.decode(get_content_encoding(request.content_type)),
         get_content_type(request.content_type),
     )
+    metrics.record(cfg.ROOT_PATH, core_response, perf_counter() - start)
     if core_response:
-        return core_response["response"]
+        if core_response.template:
+            template, f = reopen(core_response.template)
+            return Response(template.chunks(core_response.groups, f))
+        return core_response.response
     else:
         abort(404)
 
 
 if __name__ == "__main__":
+    log_config.configure()
     app.run()
@@ -0,0 +1,91 @@
+from dataclasses import asdict
+from os.path import dirname, relpath
+from threading import Lock
+from typing import Any
+
+from rsimulator_core.data import Match
+from rsimulator_core.decorators import cache_stats
+from rsimulator_core.regex import index, store
+from rsimulator_core.timing import Histogram
+
+# The latency directory of requests that did not match
+NO_MATCH = "no_match"
+
+__lock = Lock()
+__requests = 0
+__matches = 0
+# Seconds spent in core.service per directory of the matching candidates, which
+# unlike the requested paths are bounded, and of all no matches
+__latency = Histogram()
+
+
+def record(root_path: str, match: Match | None, seconds: float) -> None:
+    """
+    Records a request served by core.service.
+    """
+    global __requests, __matches
+    with __lock:
+        __requests += 1
+        __matches += match is not None
+    directory = dirname(relpath(match.candidate_path, root_path)) if match else NO_MATCH
+    __latency(directory, seconds)
+
+
+def __ratio(part: int, total: int) -> float | None:
+    return part / total if total else None
+
+
+def snapshot() -> dict[str, Any]:
+    """
+    Returns the request counts, match rates and latencies per directory of the
+    matching candidates of this process, see record, and the cache, index and store
+    stats of rsimulator_core.
+    """
+    with __lock:
+        requests, matches = __requests, __matches
+    cache = asdict(cache_stats())
+    cache["hit_ratio"] = __ratio(cache["hits"], cache["hits"] + cache["misses"])
+    return {
+        "requests": requests,
+        "matches": matches,
+        "no_matches": requests - matches,
+        "match_rate": __ratio(matches, requests),
+        "no_match_rate": __ratio(requests - matches, requests),
+        "latency": __latency.snapshot(),
+        "cache": cache,
+        "index": asdict(index.stats()),
+        "store": asdict(store.stats()),
+    }
+
+
+def prometheus() -> str:
+    """
+    Returns the snapshot in the Prometheus text exposition format.
+    """
+    value = snapshot()
+    lines = []
+    for name, kind, metric in (
+        ("requests_total", "counter", value["requests"]),
+        ("matches_total", "counter", value["matches"]),
+        ("no_matches_total", "counter", value["no_matches"]),
+        ("cache_hit_ratio", "gauge", value["cache"]["hit_ratio"] or 0.0),
+        *((f"cache_{k}", "gauge", value["cache"][k]) for k in ("entries", "bytes")),
+        *(
+            (f"cache_{k}_total", "counter", value["cache"][k])
+            for k in ("hits", "misses", "evictions", "invalidations", "bypasses")
+        ),
+        *((f"index_{k}", "gauge", v) for k, v in value["index"].items()),
+        *((f"store_{k}", "gauge", v) for k, v in value["store"].items()),
+    ):
+        lines += [f"# TYPE rsimulator_{name} {kind}", f"rsimulator_{name} {metric}"]
+    latency = __latency.prometheus(
+        "rsimulator_service_seconds", "directory", "Time spent in core.service"
+    )
+    return "\n".join(lines) + "\n" + latency
+
+
+def clear() -> None:
+    global __requests, __matches
+    with __lock:
+        __requests = __matches = 0
+    __latency.clear()
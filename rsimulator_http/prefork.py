@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import rsimulator_core.config as core_config
+import rsimulator_http.config as cfg
+from rsimulator_core import log_config
+from rsimulator_core.regex import store
+from rsimulator_core.regex.config import get_content_types
+from rsimulator_core.regex.data import Candidate
+from rsimulator_http.asgi import app
+from rsimulator_http.server import serve
+
+log = logging.getLogger(__name__)
+
+__stopping = False
+# The signals that stop the workers, which are blocked while a worker is forked
+# until it has installed its handlers
+__signals = {signal.SIGINT, signal.SIGTERM}
+
+
+def __candidates(root_path: str) -> tuple[Candidate, ...]:
+    # The same objects until their files change, see store.load. Only the
+    # directories whose mtime changed are scanned again, see index.find
+    return tuple(
+        candidate
+        for content_type in get_content_types()
+        for candidate in store.candidates(root_path, "", content_type)
+    )
+
+
+def __changed(old: tuple[Candidate, ...], new: tuple[Candidate, ...]) -> bool:
+    return len(old) != len(new) or any(a is not b for a, b in zip(old, new))
+
+
+def __warm(root_path: str) -> None:
+    start = time.perf_counter()
+    count = store.warm(root_path)
+    # Moves the loaded objects out of the garbage collector, whose bookkeeping would
+    # otherwise write to, i.e. copy, the pages shared with the workers
+    gc.collect()
+    gc.freeze()
+    log.info("Loaded %d candidates in %fs", count, time.perf_counter() - start)
+
+
+def __work(sock: socket.socket, mask: set[int]) -> None:
+    async def work() -> None:
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+        await serve(app, sock=sock)
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Stopped by the master
+    try:
+        asyncio.run(work())
+    except asyncio.CancelledError:
+        pass
+
+
+def __fork(sock: socket.socket) -> int:
+    mask = signal.pthread_sigmask(signal.SIG_BLOCK, __signals)
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            __work(sock, mask)
+        except BaseException:
+            log.exception("Worker %d failed", os.getpid())
+            code = 1
+        finally:
+            log_config.stop()
+            os._exit(code)
+    signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+    log.debug("Started worker %d", pid)
+    return pid
+
+
+def __kill(pid: int, signum: int) -> None:
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def __exited(pid: int, options: int = os.WNOHANG) -> bool:
+    try:
+        return os.waitpid(pid, options)[0] != 0
+    except ChildProcessError:
+        return True
+
+
+def __stop(pids: set[int], timeout: float) -> None:
+    # Workers that have not exited within timeout seconds are killed
+    for pid in pids:
+        __kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    running = set(pids)
+    while running := {pid for pid in running if not __exited(pid)}:
+        if time.monotonic() >= deadline:
+            for pid in running:
+                log.warning("Worker %d did not stop, killing it", pid)
+                __kill(pid, signal.SIGKILL)
+                __exited(pid, 0)
+            return
+        time.sleep(0.05)
+
+
+def __reap(pids: set[int]) -> set[int]:
+    # Returns the pids of the workers that have exited
+    exited = set()
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            break
+        if pid in pids:
+            log.warning("Worker %d exited with status %d", pid, status)
+            exited.add(pid)
+    return exited
+
+
+def __handle_stop(signum: int, frame) -> None:
+    global __stopping
+    __stopping = True
+
+
+def run(
+    workers: int,
+    host: str = cfg.HOST,
+    port: int = cfg.PORT,
+    reload_interval: float = cfg.RELOAD_INTERVAL,
+) -> None:
+    """
+    Serves rsimulator_http.asgi.app with workers forked processes that share the
+    listening socket.
+    The candidates in config.ROOT_PATH are loaded and compiled before the workers are
+    forked, so the workers share them copy-on-write.
+    If a candidate in config.ROOT_PATH changes, checked every reload_interval seconds
+    as by store.candidates, the changed candidates are loaded and new workers replace
+    the current ones.
+    Exited workers are replaced. SIGINT and SIGTERM stop all workers, and workers that
+    have not stopped within config.SHUTDOWN_TIMEOUT seconds are killed.
+    """
+    global __stopping
+    __stopping = False
+    sock = socket.create_server((host, port), backlog=1024)
+    log.info("Serving on %s with %d workers", sock.getsockname(), workers)
+    candidates = __candidates(cfg.ROOT_PATH)
+    __warm(cfg.ROOT_PATH)
+    pids = {__fork(sock) for _ in range(workers)}
+    signal.signal(signal.SIGINT, __handle_stop)
+    signal.signal(signal.SIGTERM, __handle_stop)
+    try:
+        while not __stopping:
+            time.sleep(reload_interval)
+            if exited := __reap(pids):
+                pids -= exited
+                pids |= {__fork(sock) for _ in exited}
+            if __changed(candidates, changed := __candidates(cfg.ROOT_PATH)):
+                log.info("Files in %s changed, restarting workers", cfg.ROOT_PATH)
+                candidates = changed
+                gc.unfreeze()
+                __warm(cfg.ROOT_PATH)
+                # The new workers accept connections while the old ones stop
+                old, pids = pids, {__fork(sock) for _ in range(workers)}
+                __stop(old, cfg.SHUTDOWN_TIMEOUT)
+    finally:
+        __stop(pids, cfg.SHUTDOWN_TIMEOUT)
+        sock.close()
+
+
+def main(args: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="rsimulator_http",
+        description="Serves the simulator files in a root path with forked workers.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "-b",
+        "--bind",
+        default=f"{cfg.HOST}:{cfg.PORT}",
+        help=f"address to listen on as host:port (default: {cfg.HOST}:{cfg.PORT})",
+    )
+    parser.add_argument(
+        "-r",
+        "--root-path",
+        default=cfg.ROOT_PATH,
+        help="directory with the simulator files (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-l",
+        "--log-profile",
+        choices=("development", "production"),
+        default=core_config.LOG_PROFILE,
+        help="logging profile (default: %(default)s)",
+    )
+    parsed = parser.parse_args(args)
+    host, _, port = parsed.bind.rpartition(":")
+    cfg.ROOT_PATH = parsed.root_path
+    log_config.configure(parsed.log_profile)
+    run(parsed.workers, host or cfg.HOST, int(port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import os
+import socket
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable
+from urllib.parse import unquote
+
+import rsimulator_http.config as cfg
+from rsimulator_core import log_config
+from rsimulator_http.asgi import app
+
+log = logging.getLogger(__name__)
+
+App = Callable[..., Awaitable[None]]
+
+
+@dataclass
+class __Connections:
+    # The writers of the open connections, mapped to if they are serving a request
+    busy: dict[asyncio.StreamWriter, bool] = field(default_factory=dict)
+    closing: bool = False
+
+
+class __Rejected(Exception):
+    # A request over the limits of config, responded with status
+    def __init__(self, status: HTTPStatus):
+        super().__init__(status)
+        self.status = status
+
+
+class __Response:
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        version: str,
+        keep_alive: bool,
+        head: bool = False,
+    ):
+        self.writer = writer
+        self.version = version
+        self.keep_alive = keep_alive
+        # The response to a HEAD request has no body
+        self.head = head
+        self.started = False
+        self.chunked = False
+        self.complete = False
+
+    async def send(self, message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            self.__start(message["status"], message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            await self.__body(message.get("body", b""), message.get("more_body", False))
+        elif message["type"] == "http.response.zerocopysend":
+            await self.__file(message)
+
+    def __start(self, status: int, headers: list[tuple[bytes, bytes]]) -> None:
+        names = {name.lower() for name, _ in headers}
+        if b"content-length" not in names and not self.head:
+            if self.version == "1.1":
+                self.chunked = True
+                headers = [*headers, (b"transfer-encoding", b"chunked")]
+            else:
+                self.keep_alive = False
+        if not self.keep_alive:
+            headers = [*headers, (b"connection", b"close")]
+        version = "1.0" if self.version == "1.0" else "1.1"
+        lines = [f"HTTP/{version} {status} {HTTPStatus(status).phrase}".encode()]
+        lines.extend(name + b": " + value for name, value in headers)
+        self.writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+        self.started = True
+
+    async def __file(self, message: dict[str, Any]) -> None:
+        # Sends the file with sendfile if supported by the event loop and transport
+        if self.head:
+            return await self.__body(b"", message.get("more_body", False))
+        offset, count = message.get("offset"), message.get("count")
+        if offset is None:
+            offset = message["file"].tell()
+        if count is None:
+            count = os.fstat(message["file"].fileno()).st_size - offset
+        if self.chunked and count:
+            self.writer.write(b"%x\r\n" % count)
+        await self.writer.drain()
+        await asyncio.get_running_loop().sendfile(
+            self.writer.transport, message["file"], offset, count
+        )
+        if self.chunked and count:
+            self.writer.write(b"\r\n")
+        await self.__body(b"", message.get("more_body", False))
+
+    async def __body(self, body: bytes, more_body: bool) -> None:
+        if self.chunked:
+            if body:
+                self.writer.write(b"%x\r\n%b\r\n" % (len(body), body))
+            if not more_body:
+                self.writer.write(b"0\r\n\r\n")
+        elif not self.head:
+            self.writer.write(body)
+        self.complete = not more_body
+        await self.writer.drain()
+
+
+async def __read_line(
+    reader: asyncio.StreamReader, limit: int, status: HTTPStatus
+) -> bytes:
+    try:
+        line = await reader.readline()
+    except ValueError:  # Longer than the limit of the reader
+        raise __Rejected(status)
+    if len(line) > limit:
+        raise __Rejected(status)
+    return line
+
+
+async def __read_headers(reader: asyncio.StreamReader) -> list[tuple[bytes, bytes]]:
+    header_list = []
+    size = 0
+    status = HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+    while (line := await __read_line(reader, cfg.MAX_HEADER_SIZE, status)) not in (
+        b"\r\n",
+        b"\n",
+        b"",
+    ):
+        size += len(line)
+        if size > cfg.MAX_HEADER_SIZE or len(header_list) == cfg.MAX_HEADERS:
+            raise __Rejected(status)
+        name, _, value = line.partition(b":")
+        header_list.append((name.strip().lower(), value.strip()))
+    return header_list
+
+
+async def __read_body(
+    reader: asyncio.StreamReader,
+    headers: dict[bytes, bytes],
+    writer: asyncio.StreamWriter | None = None,
+) -> bytes:
+    # If writer is given, 100 Continue is sent on it before the body is read
+    if b"chunked" in headers.get(b"transfer-encoding", b"").lower():
+        if writer:
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        chunks = []
+        size = 0
+        while chunk := int((await reader.readline()).split(b";")[0], 16):
+            if (size := size + chunk) > cfg.MAX_BODY_SIZE:
+                raise __Rejected(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            chunks.append(await reader.readexactly(chunk))
+            await reader.readline()
+        await __read_headers(reader)  # Trailers
+        return b"".join(chunks)
+    if (size := int(headers.get(b"content-length", 0))) > cfg.MAX_BODY_SIZE:
+        raise __Rejected(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+    if writer and size:
+        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+    return await reader.readexactly(size)
+
+
+async def __handle_request(
+    application: App,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    request_line: bytes,
+) -> bool:
+    # Returns True if the connection is kept alive
+    method, target, version = request_line.decode("latin-1").split()
+    version = version.removeprefix("HTTP/")
+    header_list = await __read_headers(reader)
+    headers = dict(header_list)
+    connection = headers.get(b"connection", b"").lower()
+    keep_alive = (
+        connection != b"close" if version == "1.1" else connection == b"keep-alive"
+    )
+    expect_continue = (
+        version == "1.1" and headers.get(b"expect", b"").lower() == b"100-continue"
+    )
+    body = await __read_body(reader, headers, writer if expect_continue else None)
+    path, _, query = target.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": version,
+        "method": method.upper(),
+        "scheme": "http",
+        "path": unquote(path),
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "root_path": "",
+        "headers": header_list,
+        "client": writer.get_extra_info("peername"),
+        "server": writer.get_extra_info("sockname"),
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive() -> dict[str, Any]:
+        if messages:
+            return messages.pop()
+        # The body is read, so wait until the connection is closed
+        await asyncio.Future()
+
+    response = __Response(writer, version, keep_alive, method.upper() == "HEAD")
+    try:
+        await application(scope, receive, response.send)
+    except Exception:
+        log.exception("Error serving %s %s", method, target)
+        if response.started:
+            return False
+        await response.send(
+            {
+                "type": "http.response.start",
+                "status": 500,
+                "headers": [(b"content-length", b"21")],
+            }
+        )
+        await response.send(
+            {"type": "http.response.body", "body": b"Internal Server Error"}
+        )
+    return response.complete and response.keep_alive
+
+
+async def __handle(
+    application: App,
+    connections: __Connections,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    connections.busy[writer] = False
+    try:
+        while not connections.closing and (
+            request_line := await asyncio.wait_for(
+                __read_line(
+                    reader, cfg.MAX_REQUEST_LINE, HTTPStatus.REQUEST_URI_TOO_LONG
+                ),
+                cfg.KEEP_ALIVE_TIMEOUT,
+            )
+        ):
+            connections.busy[writer] = True
+            if request_line.strip() and not await __handle_request(
+                application, reader, writer, request_line
+            ):
+                break
+            connections.busy[writer] = False
+    except __Rejected as e:
+        log.debug("Rejecting request: %r", e)
+        response = __Response(writer, "1.1", False)
+        await response.send(
+            {
+                "type": "http.response.start",
+                "status": e.status.value,
+                "headers": [(b"content-length", b"0")],
+            }
+        )
+        await response.send({"type": "http.response.body"})
+    except asyncio.TimeoutError:
+        log.debug("Closing idle connection")
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        log.debug("Closing connection: %r", e)
+    finally:
+        connections.busy.pop(writer, None)
+        writer.close()
+
+
+async def __close(connections: __Connections) -> None:
+    # Closes idle connections and waits for requests being served
+    connections.closing = True
+    deadline = asyncio.get_running_loop().time() + cfg.SHUTDOWN_TIMEOUT
+    while connections.busy and asyncio.get_running_loop().time() < deadline:
+        for writer, busy in tuple(connections.busy.items()):
+            if not busy:
+                writer.close()
+        await asyncio.sleep(0.01)
+
+
+async def __lifespan(
+    task: asyncio.Task, events: asyncio.Queue, sent: asyncio.Queue, event: str
+) -> None:
+    # Sends a lifespan event and waits until it is handled, if lifespan is supported
+    await events.put({"type": event})
+    handled = asyncio.ensure_future(sent.get())
+    await asyncio.wait((task, handled), return_when=asyncio.FIRST_COMPLETED)
+    if not handled.done():
+        handled.cancel()
+        if not task.cancelled() and task.exception():
+            log.debug("Lifespan not supported: %r", task.exception())
+
+
+async def serve(
+    application: App = app,
+    host: str = cfg.HOST,
+    port: int = cfg.PORT,
+    sock: socket.socket | None = None,
+) -> None:
+    """
+    Serves an ASGI application with HTTP/1.1 keep-alive connections, one task per
+    connection, until cancelled.
+    Requests over the limits of config, e.g. config.MAX_BODY_SIZE, are rejected, and
+    connections idle for config.KEEP_ALIVE_TIMEOUT seconds are closed.
+    If sock is given, it is served instead of binding host and port.
+    When cancelled, requests being served are given config.SHUTDOWN_TIMEOUT seconds
+    to complete.
+    """
+    connections = __Connections()
+    events, sent = asyncio.Queue(), asyncio.Queue()
+    lifespan = asyncio.create_task(
+        application(
+            {"type": "lifespan", "asgi": {"version": "3.0"}}, events.get, sent.put
+        )
+    )
+    await __lifespan(lifespan, events, sent, "lifespan.startup")
+    server = await asyncio.start_server(
+        lambda r, w: __handle(application, connections, r, w),
+        None if sock else host,
+        None if sock else port,
+        sock=sock,
+        reuse_address=None if sock else True,
+        backlog=1024,
+        # Longer lines are rejected, see __read_line
+        limit=max(cfg.MAX_REQUEST_LINE, cfg.MAX_HEADER_SIZE) + 1,
+    )
+    log.info("Serving on %s", [s.getsockname() for s in server.sockets])
+    try:
+        await asyncio.Future()  # Serving until cancelled
+    finally:
+        server.close()
+        await __close(connections)
+        await __lifespan(lifespan, events, sent, "lifespan.shutdown")
+        lifespan.cancel()
+
+
+if __name__ == "__main__":
+    log_config.configure()
+    asyncio.run(serve())
@@ -0,0 +1,95 @@
+import asyncio
+from os.path import dirname
+from time import perf_counter
+
+import pytest
+import rsimulator_core
+from rsimulator_core.regex import config as regex_config
+from rsimulator_core.regex import store
+from rsimulator_http import asgi
+from rsimulator_http import config as cfg
+
+root_dir = f"{dirname(rsimulator_core.__file__)}/regex/test/data"
+
+
+def call(method, path, body=b"", content_type=b"application/json", extensions={}):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(b"content-type", content_type)],
+        "extensions": extensions,
+    }
+    messages = [
+        {"type": "http.request", "body": body[1:], "more_body": False},
+        {"type": "http.request", "body": body[:1], "more_body": True},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop()
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            message["file"].seek(message["offset"])
+            message = {"body": message["file"].read(message["count"])}
+        sent.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    return sent[0]["status"], b"".join(m["body"] for m in sent[1:])
+
+
+@pytest.fixture(autouse=True)
+def root_path(monkeypatch):
+    monkeypatch.setattr(cfg, "ROOT_PATH", root_dir)
+
+
+@pytest.mark.parametrize(
+    "method, path, body, content_type, expected",
+    [
+        (
+            "POST",
+            "/json",
+            b'{"foo": "Hello World!"}',
+            b"application/json; charset=utf-8",
+            (200, b'{\n  "bar": "Hello World!"\n} '),
+        ),
+        ("PUT", "/json", b'{"foo": "Hello World!"}', b"application/json", 200),
+        ("HEAD", "/json", b'{"foo": "Hello World!"}', b"application/json", 200),
+        ("POST", "/json", b'{"bar": "Hello World!"}', b"application/json", 404),
+        ("PATCH", "/json", b'{"foo": "Hello World!"}', b"application/json", 405),
+    ],
+)
+def test_app(method, path, body, content_type, expected):
+    status, response = call(method, path, body, content_type)
+    if isinstance(expected, int):
+        assert status == expected
+    else:
+        assert (status, response) == expected
+
+
+def test_app_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "ROOT_PATH", str(tmp_path))
+    monkeypatch.setattr(cfg, "THROTTLE_INTERVAL", 0.01)
+    (tmp_path / "1_Request.txt").write_text("a")
+    (tmp_path / "1_Response.txt").write_text("b" * 10)
+    (tmp_path / "Profile.json").write_text(
+        '{"latency": {"value": 0.05}, "bandwidth": 200}'
+    )
+    start = perf_counter()
+    assert call("POST", "/", b"a", b"text/plain") == (200, b"b" * 10)
+    assert perf_counter() - start >= 0.05 + 10 / 200
+
+
+@pytest.mark.parametrize("extensions", [{}, {"http.response.zerocopysend": {}}])
+@pytest.mark.parametrize("response", ["", "abc", "a${1}b${2}"])
+def test_app_stream(tmp_path, monkeypatch, extensions, response):
+    monkeypatch.setattr(cfg, "ROOT_PATH", str(tmp_path))
+    monkeypatch.setattr(regex_config, "STREAM_RESPONSE_SIZE", -1)
+    store.clear()
+    (tmp_path / "1_Request.txt").write_text("(.)")
+    (tmp_path / "1_Response.txt").write_text(response)
+    assert call("POST", "/", b"x", b"text/plain", extensions) == (
+        200,
+        response.replace("${1}", "x").encode(),
+    )
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from rsimulator_core.data import Match
+from rsimulator_http import config as cfg
+from rsimulator_http import http, metrics
+from rsimulator_http.test.test_asgi import call, root_dir
+
+
+@pytest.fixture(autouse=True)
+def clear(monkeypatch):
+    monkeypatch.setattr(cfg, "ROOT_PATH", root_dir)
+    metrics.clear()
+    yield
+    metrics.clear()
+
+
+def match(candidate_path):
+    return Match("", candidate_path, "", "", "", "")
+
+
+def test_snapshot():
+    metrics.record("/root", match("/root/json/1_Request.json"), 0.001)
+    metrics.record("/root", None, 0.002)
+    metrics.record("/root", match("/root/a/xml/1_Request.xml"), 0.5)
+
+    snapshot = metrics.snapshot()
+
+    assert snapshot["requests"] == 3
+    assert snapshot["matches"] == 2
+    assert snapshot["no_matches"] == 1
+    assert snapshot["match_rate"] == 2 / 3
+    assert set(snapshot["latency"]) == {"json", "a/xml", metrics.NO_MATCH}
+    assert snapshot["latency"]["json"]["count"] == 1
+    assert snapshot["latency"]["a/xml"]["buckets"][0.25] == 0
+    assert snapshot["latency"]["a/xml"]["buckets"][0.5] == 1
+    assert {"hits", "misses", "hit_ratio"} <= set(snapshot["cache"])
+    assert {"keys", "directories", "entries"} <= set(snapshot["index"])
+    assert {"entries", "loads"} <= set(snapshot["store"])
+
+
+def test_asgi_metrics():
+    call("POST", "/json", b'{"foo": "Hello World!"}')
+    call("POST", "/json/unknown", b'{"bar": "Hello World!"}')
+
+    status, body = call("GET", cfg.METRICS_PATH)
+    snapshot = json.loads(body)
+    assert status == 200
+    assert (snapshot["requests"], snapshot["matches"]) == (2, 1)
+    assert snapshot["latency"]["json"]["count"] == 1
+    assert snapshot["latency"][metrics.NO_MATCH]["count"] == 1
+    assert snapshot["index"]["entries"] > 0
+
+    assert call("POST", cfg.METRICS_PATH)[0] == 405
+
+
+def test_http_metrics():
+    client = http.app.test_client()
+    client.post(
+        "/json", data='{"foo": "Hello World!"}', content_type="application/json"
+    )
+
+    response = client.get(cfg.METRICS_PATH)
+    assert response.status_code == 200
+    assert (response.json["requests"], response.json["matches"]) == (1, 1)
+
+    response = client.get(cfg.METRICS_PATH, query_string={"format": "prometheus"})
+    assert response.mimetype == "text/plain"
+    assert "rsimulator_requests_total 1\n" in response.text
+    assert 'rsimulator_service_seconds_count{directory="json"} 1\n' in response.text
+    assert "# TYPE rsimulator_cache_hits_total counter\n" in response.text
+
+
+def test_http_metrics_path(monkeypatch):
+    monkeypatch.setattr(cfg, "METRICS_PATH", "/json")
+    client = http.app.test_client()
+
+    assert client.get("/json").status_code == 200
+    response = client.post(
+        "/json", data='{"foo": "Hello World!"}', content_type="application/json"
+    )
+    assert response.status_code == 405
+    assert response.headers["Allow"] == "GET"
+    assert metrics.snapshot()["requests"] == 0
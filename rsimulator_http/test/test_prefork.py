@@ -0,0 +1,114 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from urllib.request import Request, urlopen
+
+import pytest
+from rsimulator_http import config as cfg
+from rsimulator_http import prefork
+
+
+def free_port():
+    with socket.create_server(("127.0.0.1", 0)) as sock:
+        return sock.getsockname()[1]
+
+
+def serve(root_path, port, log_path):
+    logging.basicConfig(filename=log_path, level=logging.INFO, force=True)
+    cfg.ROOT_PATH = root_path
+    prefork.run(2, "127.0.0.1", port, 0.1)
+
+
+def post(port, body, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        request = Request(
+            f"http://127.0.0.1:{port}/",
+            body.encode(),
+            {"Content-Type": "application/json"},
+        )
+        try:
+            with urlopen(request, timeout=1.0) as response:
+                return response.read().decode("utf-8")
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+
+def wait(pid, timeout):
+    # Returns the wait status of the process, or None if it did not exit in time
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        waited, status = os.waitpid(pid, os.WNOHANG)
+        if waited:
+            return status
+        time.sleep(0.05)
+    return None
+
+
+def test_run(tmp_path):
+    (tmp_path / "1_Request.json").write_text('{"foo": "(.*)"}')
+    (tmp_path / "1_Response.json").write_text('{"bar": "${1}"}')
+    port = free_port()
+    log_path = tmp_path / "prefork.log"
+    # Spawned, so the master does not inherit the state of the other tests
+    master = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(str(tmp_path), port, str(log_path))
+    )
+    master.start()
+    try:
+        assert post(port, '{"foo": "Hello"}') == '{"bar": "Hello"}'
+
+        # Changed candidates are loaded by new workers
+        (tmp_path / "1_Response.json").write_text('{"baz": "${1}"}')
+        deadline = time.monotonic() + 10.0
+        while "restarting workers" not in log_path.read_text():
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert post(port, '{"foo": "Hello"}') == '{"baz": "Hello"}'
+    finally:
+        master.terminate()
+        master.join(10.0)
+
+    assert master.exitcode == 0
+    with pytest.raises(ConnectionRefusedError):
+        socket.create_connection(("127.0.0.1", port)).close()
+
+
+def test_fork_blocks_signals(monkeypatch):
+    # As the master, whose handler the workers must not run
+    monkeypatch.setattr(prefork, "__stopping", False)
+    signal.signal(signal.SIGTERM, prefork.__handle_stop)
+    try:
+        with socket.create_server(("127.0.0.1", 0)) as sock:
+            pid = prefork.__fork(sock)
+            os.kill(pid, signal.SIGTERM)
+            if (status := wait(pid, 10.0)) is None:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    assert status is not None and os.waitstatus_to_exitcode(status) == 0
+
+
+def test_stop_kills():
+    mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+        time.sleep(10.0)
+        os._exit(0)
+    signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+    start = time.monotonic()
+    prefork.__stop({pid}, 0.2)
+
+    assert time.monotonic() - start < 5.0
+    with pytest.raises(ChildProcessError):
+        os.waitpid(pid, os.WNOHANG)
@@ -0,0 +1,191 @@
+import asyncio
+import socket
+
+import pytest
+from rsimulator_http import config as cfg
+from rsimulator_http.server import serve
+
+
+async def echo(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    body = (await receive())["body"]
+    headers = (
+        [] if scope["path"] == "/chunked" else [(b"content-length", b"%d" % len(body))]
+    )
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": body, "more_body": bool(body)})
+    if body:
+        await send({"type": "http.response.body"})
+
+
+async def exchange(sock, requests):
+    server = asyncio.create_task(serve(echo, sock=sock))
+    reader, writer = await asyncio.open_connection(*sock.getsockname())
+    writer.write(requests)
+    responses = await reader.readuntil(b"0\r\n\r\n")
+    writer.close()
+    server.cancel()
+    return responses
+
+
+async def exchange_closed(sock, request):
+    # Returns the response, until the connection is closed by the server
+    server = asyncio.create_task(serve(echo, sock=sock))
+    reader, writer = await asyncio.open_connection(*sock.getsockname())
+    writer.write(request)
+    response = await reader.read()
+    writer.close()
+    server.cancel()
+    return response
+
+
+def test_serve_keep_alive():
+    sock = socket.create_server(("127.0.0.1", 0))
+    responses = asyncio.run(
+        exchange(
+            sock,
+            b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello"
+            b"POST /chunked HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"2\r\nwo\r\n3\r\nrld\r\n0\r\n\r\n",
+        )
+    )
+    assert responses == (
+        b"HTTP/1.1 200 OK\r\ncontent-length: 5\r\n\r\nhello"
+        b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n"
+        b"5\r\nworld\r\n0\r\n\r\n"
+    )
+
+
+def test_serve_zerocopy(tmp_path):
+    path = tmp_path / "response"
+    path.write_bytes(b"0123456789")
+
+    async def send_file(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        assert "http.response.zerocopysend" in scope["extensions"]
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        with open(path, "rb") as f:
+            await send(
+                {
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": 2,
+                    "count": 5,
+                    "more_body": False,
+                }
+            )
+
+    async def get(sock):
+        server = asyncio.create_task(serve(send_file, sock=sock))
+        reader, writer = await asyncio.open_connection(*sock.getsockname())
+        writer.write(b"GET / HTTP/1.1\r\n\r\n")
+        response = await reader.readuntil(b"0\r\n\r\n")
+        writer.close()
+        server.cancel()
+        return response
+
+    sock = socket.create_server(("127.0.0.1", 0))
+    assert asyncio.run(get(sock)) == (
+        b"HTTP/1.1 200 OK\r\ntransfer-encoding: chunked\r\n\r\n5\r\n23456\r\n0\r\n\r\n"
+    )
+
+
+def test_serve_head():
+    sock = socket.create_server(("127.0.0.1", 0))
+    response = asyncio.run(
+        exchange_closed(
+            sock,
+            b"HEAD / HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\nhello",
+        )
+    )
+    assert response == (
+        b"HTTP/1.1 200 OK\r\ncontent-length: 5\r\nconnection: close\r\n\r\n"
+    )
+
+
+def test_serve_http_1_0():
+    sock = socket.create_server(("127.0.0.1", 0))
+    response = asyncio.run(
+        exchange_closed(
+            sock, b"POST /chunked HTTP/1.0\r\nContent-Length: 5\r\n\r\nhello"
+        )
+    )
+    assert response == b"HTTP/1.0 200 OK\r\nconnection: close\r\n\r\nhello"
+
+
+def test_serve_expect_continue():
+    async def post(sock):
+        server = asyncio.create_task(serve(echo, sock=sock))
+        reader, writer = await asyncio.open_connection(*sock.getsockname())
+        writer.write(
+            b"POST / HTTP/1.1\r\nContent-Length: 5\r\nExpect: 100-continue\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        # The body is sent when asked for
+        interim = await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"hello")
+        response = await reader.read()
+        writer.close()
+        server.cancel()
+        return interim, response
+
+    sock = socket.create_server(("127.0.0.1", 0))
+    assert asyncio.run(post(sock)) == (
+        b"HTTP/1.1 100 Continue\r\n\r\n",
+        b"HTTP/1.1 200 OK\r\ncontent-length: 5\r\nconnection: close\r\n\r\nhello",
+    )
+
+
+def test_serve_keep_alive_timeout(monkeypatch):
+    monkeypatch.setattr(cfg, "KEEP_ALIVE_TIMEOUT", 0.1)
+    sock = socket.create_server(("127.0.0.1", 0))
+
+    # Closed by the server when idle after the response
+    response = asyncio.run(
+        exchange_closed(sock, b"POST / HTTP/1.1\r\nContent-Length: 2\r\n\r\nhi")
+    )
+
+    assert response == b"HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\nhi"
+
+
+@pytest.mark.parametrize(
+    "request_bytes, status",
+    [
+        (b"GET /%b HTTP/1.1\r\n\r\n" % (b"a" * 64), b"414 Request-URI Too Long"),
+        (
+            b"GET / HTTP/1.1\r\nA: 1\r\nB: 2\r\nC: 3\r\n\r\n",
+            b"431 Request Header Fields Too Large",
+        ),
+        (
+            b"GET / HTTP/1.1\r\nA: %b\r\n\r\n" % (b"a" * 64),
+            b"431 Request Header Fields Too Large",
+        ),
+        (
+            b"GET / HTTP/1.1\r\nA: %b\r\nB: %b\r\n\r\n" % (b"a" * 32, b"b" * 32),
+            b"431 Request Header Fields Too Large",
+        ),
+        (
+            b"POST / HTTP/1.1\r\nContent-Length: 17\r\n\r\n",
+            b"413 Request Entity Too Large",
+        ),
+        (
+            b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n10\r\n%b\r\n2\r\n"
+            % (b"a" * 16),
+            b"413 Request Entity Too Large",
+        ),
+    ],
+)
+def test_serve_limits(monkeypatch, request_bytes, status):
+    monkeypatch.setattr(cfg, "MAX_REQUEST_LINE", 64)
+    monkeypatch.setattr(cfg, "MAX_HEADER_SIZE", 64)
+    monkeypatch.setattr(cfg, "MAX_HEADERS", 2)
+    monkeypatch.setattr(cfg, "MAX_BODY_SIZE", 16)
+    sock = socket.create_server(("127.0.0.1", 0))
+
+    response = asyncio.run(exchange_closed(sock, request_bytes))
+
+    assert response == (
+        b"HTTP/1.1 %b\r\ncontent-length: 0\r\nconnection: close\r\n\r\n" % status
+    )